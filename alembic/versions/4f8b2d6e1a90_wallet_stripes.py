@@ -0,0 +1,52 @@
+"""Wallet stripes
+
+Revision ID: 4f8b2d6e1a90
+Revises: e71d4a08c2f9
+Create Date: 2026-10-18 12:37:55.201846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8b2d6e1a90'
+down_revision: Union[str, Sequence[str], None] = 'e71d4a08c2f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wallets', sa.Column('stripe_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('wallet_stripes',
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('stripe_no', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.CheckConstraint('balance >= 0', name=op.f('ck_wallet_stripes_ck_wallet_stripes_balance_non_negative')),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], name=op.f('fk_wallet_stripes_wallet_id_wallets'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('wallet_id', 'stripe_no', name=op.f('pk_wallet_stripes'))
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION notify_wallet_stripe_changed() RETURNS trigger AS $$ "
+        "BEGIN "
+        "PERFORM pg_notify('wallet_changed', NEW.wallet_id::text); "
+        "RETURN NULL; "
+        "END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER trg_wallet_stripes_notify_changed "
+        "AFTER UPDATE OF balance ON wallet_stripes "
+        "FOR EACH ROW WHEN (OLD.balance IS DISTINCT FROM NEW.balance) "
+        "EXECUTE FUNCTION notify_wallet_stripe_changed()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('wallet_stripes')
+    op.execute("DROP FUNCTION notify_wallet_stripe_changed()")
+    op.drop_column('wallets', 'stripe_count')
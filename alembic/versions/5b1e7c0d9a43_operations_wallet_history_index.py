@@ -0,0 +1,41 @@
+"""Operations wallet history index
+
+Revision ID: 5b1e7c0d9a43
+Revises: 2332cb37b9b5
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7c0d9a43'
+down_revision: Union[str, Sequence[str], None] = '2332cb37b9b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_operations_wallet_id_created_at_id',
+            'operations',
+            ['wallet_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_include=['operation_type', 'amount'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_operations_wallet_id_created_at_id',
+            table_name='operations',
+            postgresql_concurrently=True,
+        )
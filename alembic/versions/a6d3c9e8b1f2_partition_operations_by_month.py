@@ -0,0 +1,91 @@
+"""Partition operations by month
+
+Revision ID: a6d3c9e8b1f2
+Revises: 4f8b2d6e1a90
+Create Date: 2026-10-18 14:05:12.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3c9e8b1f2'
+down_revision: Union[str, Sequence[str], None] = '4f8b2d6e1a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_operations_table(**kwargs) -> None:
+    op.create_table('operations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('operation_type', postgresql.ENUM('DEPOSIT', 'WITHDRAW', name='operation_type_enum', create_type=False), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('amount > 0', name=op.f('ck_operations_ck_operation_amount_positive')),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], name=op.f('fk_operations_wallet_id_wallets'), ondelete='CASCADE'),
+    **kwargs,
+    )
+
+
+def _create_history_index() -> None:
+    op.create_index(
+        'ix_operations_wallet_id_created_at_id',
+        'operations',
+        ['wallet_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_include=['operation_type', 'amount'],
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rewrites the table under an exclusive lock, plan downtime proportional to its size.
+    op.rename_table('operations', 'operations_unpartitioned')
+    op.execute("ALTER TABLE operations_unpartitioned RENAME CONSTRAINT pk_operations TO pk_operations_unpartitioned")
+    op.drop_index('ix_operations_wallet_id_created_at_id', table_name='operations_unpartitioned')
+
+    _create_operations_table(postgresql_partition_by='RANGE (created_at)')
+    op.create_primary_key(op.f('pk_operations'), 'operations', ['id', 'created_at'])
+    op.execute("CREATE TABLE operations_default PARTITION OF operations DEFAULT")
+    # One partition per month from the oldest operation up to three months ahead.
+    op.execute(
+        "DO $$ "
+        "DECLARE "
+        "partition_month timestamp := date_trunc('month', "
+        "coalesce((SELECT min(created_at) FROM operations_unpartitioned), now()) AT TIME ZONE 'UTC'); "
+        "BEGIN "
+        "WHILE partition_month <= date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months' LOOP "
+        "EXECUTE format('CREATE TABLE %I PARTITION OF operations FOR VALUES FROM (%L) TO (%L)', "
+        "'operations_p' || to_char(partition_month, 'YYYYMM'), "
+        "partition_month AT TIME ZONE 'UTC', (partition_month + interval '1 month') AT TIME ZONE 'UTC'); "
+        "partition_month := partition_month + interval '1 month'; "
+        "END LOOP; "
+        "END $$"
+    )
+    op.execute(
+        "INSERT INTO operations (id, wallet_id, operation_type, amount, created_at) "
+        "SELECT id, wallet_id, operation_type, amount, created_at FROM operations_unpartitioned"
+    )
+    op.drop_table('operations_unpartitioned')
+    _create_history_index()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('operations', 'operations_partitioned')
+    op.execute("ALTER TABLE operations_partitioned RENAME CONSTRAINT pk_operations TO pk_operations_partitioned")
+    op.drop_index('ix_operations_wallet_id_created_at_id', table_name='operations_partitioned')
+
+    _create_operations_table()
+    op.create_primary_key(op.f('pk_operations'), 'operations', ['id'])
+    op.execute(
+        "INSERT INTO operations (id, wallet_id, operation_type, amount, created_at) "
+        "SELECT id, wallet_id, operation_type, amount, created_at FROM operations_partitioned"
+    )
+    op.drop_table('operations_partitioned')
+    _create_history_index()
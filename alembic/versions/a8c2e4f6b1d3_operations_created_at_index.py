@@ -0,0 +1,29 @@
+"""Operations created_at index
+
+Revision ID: a8c2e4f6b1d3
+Revises: f3b7d1e9a2c4
+Create Date: 2026-10-18 21:40:12.640275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c2e4f6b1d3'
+down_revision: Union[str, Sequence[str], None] = 'f3b7d1e9a2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Full exports read partitions in order through it instead of sorting the whole ledger.
+    # Indexes on a partitioned table can't be built concurrently, writes to operations wait until it is built.
+    op.create_index('ix_operations_created_at_id', 'operations', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_operations_created_at_id', table_name='operations')
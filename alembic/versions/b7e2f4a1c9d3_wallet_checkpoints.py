@@ -0,0 +1,49 @@
+"""Wallet checkpoints
+
+Revision ID: b7e2f4a1c9d3
+Revises: a6d3c9e8b1f2
+Create Date: 2026-10-18 15:21:40.318562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2f4a1c9d3'
+down_revision: Union[str, Sequence[str], None] = 'a6d3c9e8b1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('wallet_checkpoints',
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.Column('last_operation_created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_operation_id', sa.UUID(), nullable=True),
+    sa.Column('verified_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], name=op.f('fk_wallet_checkpoints_wallet_id_wallets'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('wallet_id', name=op.f('pk_wallet_checkpoints'))
+    )
+    # Existing balances are taken as verified up to the latest operation of each wallet.
+    op.execute(
+        "INSERT INTO wallet_checkpoints (wallet_id, balance, last_operation_created_at, last_operation_id) "
+        "SELECT w.id, "
+        "w.balance + CASE WHEN w.stripe_count > 0 "
+        "THEN (SELECT coalesce(sum(s.balance), 0) FROM wallet_stripes s WHERE s.wallet_id = w.id) ELSE 0 END, "
+        "last_op.created_at, last_op.id "
+        "FROM wallets w "
+        "LEFT JOIN LATERAL ("
+        "SELECT o.created_at, o.id FROM operations o WHERE o.wallet_id = w.id "
+        "ORDER BY o.created_at DESC, o.id DESC LIMIT 1"
+        ") last_op ON true"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('wallet_checkpoints')
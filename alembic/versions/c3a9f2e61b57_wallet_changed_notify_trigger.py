@@ -0,0 +1,41 @@
+"""Wallet changed notify trigger
+
+Revision ID: c3a9f2e61b57
+Revises: 5b1e7c0d9a43
+Create Date: 2026-10-18 11:04:27.093511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a9f2e61b57'
+down_revision: Union[str, Sequence[str], None] = '5b1e7c0d9a43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE OR REPLACE FUNCTION notify_wallet_changed() RETURNS trigger AS $$ "
+        "BEGIN "
+        "PERFORM pg_notify('wallet_changed', NEW.id::text); "
+        "RETURN NULL; "
+        "END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER trg_wallets_notify_changed "
+        "AFTER UPDATE OF balance ON wallets "
+        "FOR EACH ROW WHEN (OLD.balance IS DISTINCT FROM NEW.balance) "
+        "EXECUTE FUNCTION notify_wallet_changed()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER trg_wallets_notify_changed ON wallets")
+    op.execute("DROP FUNCTION notify_wallet_changed()")
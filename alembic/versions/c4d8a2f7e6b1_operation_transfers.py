@@ -0,0 +1,41 @@
+"""Operation transfers
+
+Revision ID: c4d8a2f7e6b1
+Revises: b7e2f4a1c9d3
+Create Date: 2026-10-18 16:02:33.845170
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8a2f7e6b1'
+down_revision: Union[str, Sequence[str], None] = 'b7e2f4a1c9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # New enum values can't be used in the transaction that adds them.
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE operation_type_enum ADD VALUE IF NOT EXISTS 'TRANSFER_OUT'")
+        op.execute("ALTER TYPE operation_type_enum ADD VALUE IF NOT EXISTS 'TRANSFER_IN'")
+    op.add_column('operations', sa.Column('transfer_id', sa.UUID(), nullable=True))
+    op.create_index(
+        'ix_operations_transfer_id',
+        'operations',
+        ['transfer_id'],
+        unique=False,
+        postgresql_where=sa.text('transfer_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Postgres can't drop enum values; TRANSFER_OUT and TRANSFER_IN stay in operation_type_enum.
+    op.drop_index('ix_operations_transfer_id', table_name='operations')
+    op.drop_column('operations', 'transfer_id')
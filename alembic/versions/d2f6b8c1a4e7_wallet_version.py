@@ -0,0 +1,29 @@
+"""Wallet version
+
+Revision ID: d2f6b8c1a4e7
+Revises: c4d8a2f7e6b1
+Create Date: 2026-10-18 17:12:48.306915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6b8c1a4e7'
+down_revision: Union[str, Sequence[str], None] = 'c4d8a2f7e6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant default doesn't rewrite the table.
+    op.add_column('wallets', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('wallets', 'version')
@@ -0,0 +1,79 @@
+"""Amounts in minor units
+
+Revision ID: e5a1c7d3f9b2
+Revises: d2f6b8c1a4e7
+Create Date: 2026-10-18 18:26:09.518432
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7d3f9b2'
+down_revision: Union[str, Sequence[str], None] = 'd2f6b8c1a4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+AMOUNT_COLUMNS = [
+    ('wallets', 'balance'),
+    ('wallet_stripes', 'balance'),
+    ('wallet_checkpoints', 'balance'),
+    ('operations', 'amount'),
+    ('idempotency_keys', 'amount'),
+]
+
+# Triggers whose WHEN clause reads a balance; Postgres can't change the type of a column used there.
+NOTIFY_TRIGGERS = [
+    ('trg_wallets_notify_changed', 'wallets', 'notify_wallet_changed'),
+    ('trg_wallet_stripes_notify_changed', 'wallet_stripes', 'notify_wallet_stripe_changed'),
+]
+
+
+def _drop_notify_triggers() -> None:
+    for trigger, table, _ in NOTIFY_TRIGGERS:
+        op.execute(f"DROP TRIGGER {trigger} ON {table}")
+
+
+def _create_notify_triggers() -> None:
+    for trigger, table, function in NOTIFY_TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {trigger} "
+            f"AFTER UPDATE OF balance ON {table} "
+            "FOR EACH ROW WHEN (OLD.balance IS DISTINCT FROM NEW.balance) "
+            f"EXECUTE FUNCTION {function}()"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rewrites the tables under an exclusive lock, plan downtime proportional to their size.
+    _drop_notify_triggers()
+    for table, column in AMOUNT_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.BigInteger(),
+            existing_type=sa.Numeric(precision=20, scale=2),
+            existing_nullable=False,
+            postgresql_using=f'({column} * 100)::bigint',
+        )
+    _create_notify_triggers()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_notify_triggers()
+    for table, column in AMOUNT_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.Numeric(precision=20, scale=2),
+            existing_type=sa.BigInteger(),
+            existing_nullable=False,
+            postgresql_using=f'({column}::numeric / 100)::numeric(20, 2)',
+        )
+    _create_notify_triggers()
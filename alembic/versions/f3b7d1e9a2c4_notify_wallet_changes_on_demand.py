@@ -0,0 +1,49 @@
+"""Notify wallet changes on demand
+
+Revision ID: f3b7d1e9a2c4
+Revises: e5a1c7d3f9b2
+Create Date: 2026-10-18 21:12:40.385117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7d1e9a2c4'
+down_revision: Union[str, Sequence[str], None] = 'e5a1c7d3f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOTIFY_FUNCTIONS = [
+    ('notify_wallet_changed', 'NEW.id'),
+    ('notify_wallet_stripe_changed', 'NEW.wallet_id'),
+]
+
+
+def _create_notify_functions(only_when_enabled: bool) -> None:
+    for function, wallet_id in NOTIFY_FUNCTIONS:
+        notify = f"PERFORM pg_notify('wallet_changed', {wallet_id}::text); "
+        if only_when_enabled:
+            notify = f"IF current_setting('wallet.notify_changes', true) = 'on' THEN {notify}END IF; "
+        op.execute(
+            f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$ "
+            "BEGIN "
+            f"{notify}"
+            "RETURN NULL; "
+            "END; "
+            "$$ LANGUAGE plpgsql"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Only connections of workers with the wallet cache enabled set wallet.notify_changes.
+    _create_notify_functions(only_when_enabled=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _create_notify_functions(only_when_enabled=False)
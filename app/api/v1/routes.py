@@ -1,11 +1,34 @@
+import zlib
+from datetime import datetime
 from uuid import UUID
-from typing import Annotated, List
+from typing import Annotated, Any, AsyncIterator, Awaitable, List, Optional, Tuple
 
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-from app.schemas.operation import OperationRead, OperationCreate
-from app.schemas.wallet import WalletRead, WalletCreate
+from app.schemas.operation import (
+    OperationRead,
+    OperationCreate,
+    OperationBatchCreate,
+    OperationBatchItem,
+    OperationBatchItemResult,
+    OperationBatchRead,
+    operation_rows_adapter,
+)
+from app.schemas.wallet import (
+    WalletRead,
+    WalletCreate,
+    WalletImportRead,
+    WalletRow,
+    WalletStripesUpdate,
+    wallet_row_adapter,
+    wallet_rows_adapter,
+)
+from app.schemas.transfer import TransferCreate, TransferRead
+from app.schemas.cursor import InvalidCursorException, decode_operation_cursor, encode_operation_cursor
 from app.models.enums import OperationType
+from app.db.base import is_database_busy_error
+from app.metrics import OPERATION_OUTCOMES
 from app.services.wallet_service import (
     WalletService,
     get_wallet_service,
@@ -13,11 +36,30 @@ from app.services.wallet_service import (
     UnsupportedOperationException,
     UnrecognizedWalletId,
     WalletAlreadyExistException,
+    BatchOperationException,
+    IdempotencyKeyReusedException,
+    StripeCountDecreaseException,
+)
+from app.services.wallet_import import (
+    CSV_MEDIA_TYPE,
+    LINE_PARSERS,
+    NDJSON_MEDIA_TYPE,
+    WalletImportFormatException,
+    parse_wallet_rows,
 )
 
 
 router = APIRouter(prefix="/api/v1", tags=["wallet_service"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+OPERATION_OUTCOME_BY_EXCEPTION = {
+    InsufficientFundsException: "insufficient_funds",
+    UnsupportedOperationException: "unsupported_operation",
+    UnrecognizedWalletId: "wallet_not_found",
+    IdempotencyKeyReusedException: "idempotency_key_reused",
+}
+
 
 @router.post(
     "/wallets/{wallet_id}/operation",
@@ -28,10 +70,14 @@ router = APIRouter(prefix="/api/v1", tags=["wallet_service"])
 async def apply_operation(
         wallet_id: UUID,
         op: OperationCreate,
-        service: Annotated[WalletService, Depends(get_wallet_service)]
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+        idempotency_key: Annotated[Optional[str], Header(
+            max_length=255,
+            description="Key of request. Repeating request with the same key returns result of the first one.",
+        )] = None,
 ) -> OperationRead:
     try:
-        operation = await service.apply_operation(wallet_id, op.amount, op.operation_type)
+        operation = await _counted(service.apply_operation(wallet_id, op.amount, op.operation_type, idempotency_key))
     except InsufficientFundsException:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds.")
     except UnsupportedOperationException:
@@ -41,26 +87,185 @@ async def apply_operation(
         )
     except UnrecognizedWalletId:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Wallet with id={wallet_id} not found.")
+    except IdempotencyKeyReusedException:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Idempotency key {idempotency_key} was already used for another request."
+        )
     else:
         return OperationRead.model_validate(operation)
 
 
+@router.post(
+    "/operations/batch",
+    response_model=OperationBatchRead,
+    status_code=status.HTTP_200_OK,
+    summary=f"Apply batch of operations ({OperationType}) to many wallets in one transaction.",
+)
+async def apply_operations_batch(
+        batch: OperationBatchCreate,
+        service: Annotated[WalletService, Depends(get_wallet_service)]
+) -> OperationBatchRead:
+    items = [(op.wallet_id, op.amount, op.operation_type) for op in batch.operations]
+    try:
+        results = await service.apply_operations_batch(items, batch.atomic)
+    except BatchOperationException as e:
+        _count_outcome(e.cause)
+        status_code, detail = _batch_item_error(batch.operations[e.index], e.cause)
+        raise HTTPException(status_code=status_code, detail=f"Operation #{e.index}: {detail}")
+    item_results = []
+    for index, (op, result) in enumerate(zip(batch.operations, results)):
+        _count_outcome(result)
+        if isinstance(result, Exception):
+            status_code, detail = _batch_item_error(op, result)
+            item_results.append(OperationBatchItemResult(index=index, status_code=status_code, detail=detail))
+        else:
+            item_results.append(OperationBatchItemResult(
+                index=index,
+                status_code=status.HTTP_201_CREATED,
+                operation=OperationRead.model_validate(result),
+            ))
+    return OperationBatchRead(results=item_results)
+
+
+@router.post(
+    "/transfers",
+    response_model=TransferRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Move amount from one wallet to another in one transaction.",
+)
+async def create_transfer(
+        transfer: TransferCreate,
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+) -> TransferRead:
+    try:
+        return await service.transfer(transfer.from_wallet_id, transfer.to_wallet_id, transfer.amount)
+    except InsufficientFundsException:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds.")
+    except UnrecognizedWalletId as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Wallet with id={e.args[0]} not found.")
+
+
+async def _counted(result: Awaitable[Any]) -> Any:
+    try:
+        result = await result
+    except Exception as e:
+        _count_outcome(e)
+        raise
+    _count_outcome(result)
+    return result
+
+
+def _count_outcome(result: Any) -> None:
+    if isinstance(result, Exception) and is_database_busy_error(result):
+        outcome = "database_busy"
+    elif isinstance(result, Exception):
+        outcome = OPERATION_OUTCOME_BY_EXCEPTION.get(type(result), "error")
+    else:
+        outcome = "applied"
+    OPERATION_OUTCOMES.labels(outcome=outcome).inc()
+
+
+def _batch_item_error(op: OperationBatchItem, e: Exception) -> Tuple[int, str]:
+    if isinstance(e, InsufficientFundsException):
+        return status.HTTP_400_BAD_REQUEST, "Insufficient funds."
+    if isinstance(e, UnsupportedOperationException):
+        return status.HTTP_400_BAD_REQUEST, f"Unsupported operation type {op.operation_type}"
+    if isinstance(e, UnrecognizedWalletId):
+        return status.HTTP_404_NOT_FOUND, f"Wallet with id={op.wallet_id} not found."
+    raise e
+
+
 @router.get(
     "/wallets/{wallet_id}/operation",
     response_model=List[OperationRead],
     status_code=status.HTTP_200_OK,
-    summary=f"Get all operations of specified wallet.",
+    summary=f"Get operations of specified wallet, newest first. "
+            f"Cursor of the next page is returned in {NEXT_CURSOR_HEADER} header.",
 )
 async def get_operation(
         wallet_id: UUID,
-        service: Annotated[WalletService, Depends(get_wallet_service)]
-) -> List[OperationRead]:
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+        limit: Annotated[int, Query(ge=1, le=1000, description="Max number of operations in page.")] = 10,
+        cursor: Annotated[Optional[str], Query(description="Cursor of page returned by previous request.")] = None,
+        since: Annotated[Optional[datetime], Query(description="Return operations created at or after.")] = None,
+        until: Annotated[Optional[datetime], Query(description="Return operations created before.")] = None,
+) -> Response:
     try:
-        ops = await service.get_all_operations_by_wallet_id(wallet_id)
+        after = decode_operation_cursor(cursor) if cursor is not None else None
+        ops, has_more = await service.get_all_operations_by_wallet_id(wallet_id, limit, after, since, until)
+    except InvalidCursorException:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor.")
     except UnrecognizedWalletId:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Wallet's root not found.")
     else:
-        return [OperationRead.model_validate(op) for op in ops]
+        # Rows are serialized once, straight to JSON; response_model only documents the schema.
+        response = Response(operation_rows_adapter.dump_json(ops), media_type="application/json")
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_operation_cursor(ops[-1]["created_at"], ops[-1]["id"])
+        return response
+
+
+@router.get(
+    "/operations/export",
+    status_code=status.HTTP_200_OK,
+    summary="Stream operations ordered by creation time as CSV, or as NDJSON if requested with "
+            "Accept: application/x-ndjson. Compressed with gzip if the client accepts it.",
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {CSV_MEDIA_TYPE: {}, NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_operations(
+        request: Request,
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+        wallet_id: Annotated[Optional[UUID], Query(description="Export operations of this wallet only.")] = None,
+        since: Annotated[Optional[datetime], Query(description="Export operations created at or after.")] = None,
+        until: Annotated[Optional[datetime], Query(description="Export operations created before.")] = None,
+) -> StreamingResponse:
+    ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    chunks = service.export_operations(ndjson, wallet_id, since, until)
+    # The first chunk is awaited here, so errors of the query are still reported with their status code.
+    first_chunk = await anext(chunks, b"")
+    media_type = NDJSON_MEDIA_TYPE if ndjson else CSV_MEDIA_TYPE
+    headers = {"Content-Disposition": f'attachment; filename="operations.{"ndjson" if ndjson else "csv"}"'}
+    body = _prepended(first_chunk, chunks)
+    headers["Vary"] = "Accept-Encoding"
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        body = _gzipped(body)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # "gzip;q=0" refuses gzip; "*" covers it unless gzip is listed on its own.
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+
+async def _prepended(first_chunk: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield first_chunk
+    async for chunk in chunks:
+        yield chunk
+
+
+async def _gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
 
 
 @router.get(
@@ -85,17 +290,45 @@ async def get_wallet(
     "/wallets",
     response_model=List[WalletRead],
     status_code=status.HTTP_200_OK,
-    summary="Return wallets."
+    summary="Return wallets ordered by id. "
+            "Response is streamed as JSON array, or as NDJSON if requested with Accept: application/x-ndjson."
 )
 async def get_wallets(
-        service: Annotated[WalletService, Depends(get_wallet_service)]
-) -> List[WalletRead]:
-    try:
-        wallets = await service.get_all_wallets()
-    except UnrecognizedWalletId:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Wallet's root not found.")
-    else:
-        return [WalletRead.model_validate(w) for w in wallets]
+        request: Request,
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+        after: Annotated[Optional[UUID], Query(description="Return wallets with id greater than given.")] = None,
+        limit: Annotated[Optional[int], Query(ge=1, description="Max number of wallets.")] = None,
+) -> StreamingResponse:
+    wallets = service.get_all_wallets(after, limit)
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_wallets_ndjson(wallets), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_wallets_json_array(wallets), media_type="application/json")
+
+
+async def _wallets_ndjson(wallets: AsyncIterator[WalletRow]) -> AsyncIterator[bytes]:
+    async for chunk in _chunks(wallets):
+        yield b"".join(wallet_row_adapter.dump_json(wallet) + b"\n" for wallet in chunk)
+
+
+async def _wallets_json_array(wallets: AsyncIterator[WalletRow]) -> AsyncIterator[bytes]:
+    yield b"["
+    separator = b""
+    async for chunk in _chunks(wallets):
+        # Chunk is dumped as an array in one call, its brackets are dropped.
+        yield separator + wallet_rows_adapter.dump_json(chunk)[1:-1]
+        separator = b","
+    yield b"]"
+
+
+async def _chunks(wallets: AsyncIterator[WalletRow], chunk_size: int = 500) -> AsyncIterator[List[WalletRow]]:
+    chunk = []
+    async for wallet in wallets:
+        chunk.append(wallet)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 @router.post(
@@ -114,3 +347,53 @@ async def create_wallet_by_id(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Wallet with id={w.id} is already exist.")
     else:
         return WalletRead.model_validate(wallet)
+
+
+@router.post(
+    "/wallets/import",
+    response_model=WalletImportRead,
+    status_code=status.HTTP_200_OK,
+    summary="Create wallets from uploaded CSV (id,balance) or NDJSON ({\"id\": ..., \"balance\": ...}). "
+            "Wallets with ids already taken are skipped and reported.",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {"schema": {"type": "string"}} for media_type in LINE_PARSERS},
+        },
+    },
+)
+async def import_wallets(
+        request: Request,
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+) -> WalletImportRead:
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in LINE_PARSERS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be one of: {', '.join(LINE_PARSERS)}.",
+        )
+    try:
+        return await service.import_wallets(parse_wallet_rows(request.stream(), media_type))
+    except WalletImportFormatException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.put(
+    "/wallets/{wallet_id}/stripes",
+    response_model=WalletRead,
+    status_code=status.HTTP_200_OK,
+    summary="Spread wallet's balance over several rows, so concurrent deposits don't wait for each other."
+)
+async def enable_wallet_striping(
+        wallet_id: UUID,
+        stripes: WalletStripesUpdate,
+        service: Annotated[WalletService, Depends(get_wallet_service)],
+) -> WalletRead:
+    try:
+        wallet = await service.enable_striping(wallet_id, stripes.stripe_count)
+    except UnrecognizedWalletId:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Wallet with id={wallet_id} not found.")
+    except StripeCountDecreaseException:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Number of stripes can't be decreased.")
+    else:
+        return wallet
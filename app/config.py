@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Any, Literal, Optional, cast
+
 from pydantic_settings import BaseSettings
 
 
@@ -9,11 +12,60 @@ class Settings(BaseSettings):
     SQL_ECHO: bool
     DB_POOL_SIZE: int
     DB_MAX_OVERFLOW: int
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_TIMEOUT_SECONDS: float = 5.0
+    DB_LOCK_TIMEOUT_MS: int = 2000
+    DB_STATEMENT_TIMEOUT_MS: int = 10000
+    DB_MAX_IN_FLIGHT: int = 64
+    DB_ADMISSION_TIMEOUT_SECONDS: float = 0.5
+    RETRY_AFTER_SECONDS: int = 1
+    DB_ISOLATION_LEVEL: Optional[Literal["READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE"]] = None
+    DB_RETRY_MAX_ATTEMPTS: int = 3
+    DB_RETRY_BASE_DELAY_MS: float = 10.0
+    DB_RETRY_MAX_DELAY_MS: float = 200.0
+    DB_RETRY_BUDGET_RATIO: float = 0.1
+    DB_RETRY_BUDGET_MAX_TOKENS: float = 20.0
+    DATABASE_READ_URL: Optional[str] = None
+    DB_READ_MAX_STALENESS_SECONDS: float = 1.0
+    DB_READ_STALENESS_CHECK_INTERVAL_SECONDS: float = 1.0
+    APPLY_OPERATION_MODE: Literal["locking", "single_statement", "optimistic"] = "locking"
+    OPTIMISTIC_MAX_CONFLICTS: int = 3
+    REPOSITORY_BACKEND: Literal["orm", "asyncpg"] = "orm"
+    OPERATION_COMBINER_ENABLED: bool = True
+    OPERATION_COMBINER_MAX_BATCH: int = 100
+    GROUP_COMMIT_ENABLED: bool = False
+    GROUP_COMMIT_WINDOW_MS: float = 2.0
+    GROUP_COMMIT_MAX_SIZE: int = 100
+    WALLETS_STREAM_BATCH_SIZE: int = 1000
+    WALLET_IMPORT_MAX_REPORTED_DUPLICATES: int = 1000
+    WALLET_CACHE_ENABLED: bool = False
+    WALLET_CACHE_MAX_SIZE: int = 10000
+    WALLET_CACHE_TTL_SECONDS: float = 5.0
+    RECONCILIATION_BATCH_SIZE: int = 500
+    RECONCILIATION_CONCURRENCY: int = 4
+    RECONCILIATION_INTERVAL_SECONDS: float = 0.0
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_HEADER: str = "X-Debug-Trace"
+    TRACE_PROFILE_DIR: Optional[str] = None
 
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    # Settings are read from the environment on first use, so importing the app's modules doesn't require them.
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_settings(), name, value)
+
+
+settings = cast(Settings, _LazySettings())
 
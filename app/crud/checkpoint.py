@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import BigInteger, and_, any_, bindparam, cast, func, or_, select, text, true, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from app.crud.operation import signed_amount
+from app.crud.wallet import _total_balance
+from app.models.checkpoint import WalletCheckpoint
+from app.models.operation import Operation
+from app.models.wallet import Wallet
+
+
+async def create_checkpoint(session: AsyncSession, wallet_id: UUID, balance: int) -> None:
+    session.add(WalletCheckpoint(wallet_id=wallet_id, balance=balance))
+
+
+async def read_safe_horizon(session: AsyncSession) -> datetime:
+    # Operations get created_at = start of their transaction. Every operation created before the oldest transaction
+    # still open now has committed already, so a snapshot taken after this query sees all of them.
+    stmt = text(
+        "SELECT least(now(), min(xact_start)) FROM pg_stat_activity "
+        "WHERE xact_start IS NOT NULL AND pid <> pg_backend_pid()"
+    )
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def list_wallet_ids(session: AsyncSession, after: Optional[UUID], limit: int) -> List[UUID]:
+    stmt = select(Wallet.id).order_by(Wallet.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(Wallet.id > after)
+    return list((await session.scalars(stmt)).all())
+
+
+async def read_unverified_totals(
+    session: AsyncSession,
+    wallet_ids: List[UUID],
+    horizon: datetime,
+) -> List[Dict[str, Any]]:
+    # For each wallet: its checkpoint, current total balance and the sum of operations after the checkpoint,
+    # all of them and only those before the horizon, with the last of the latter.
+    # Wallets without a checkpoint are checked against their whole ledger from zero.
+    ids = bindparam("wallet_ids", wallet_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+    checkpoint = WalletCheckpoint.__table__.alias("checkpoint")
+    after_checkpoint = and_(
+        Operation.wallet_id == Wallet.id,
+        or_(
+            checkpoint.c.last_operation_created_at.is_(None),
+            and_(
+                Operation.created_at >= checkpoint.c.last_operation_created_at,
+                tuple_(Operation.created_at, Operation.id)
+                > tuple_(checkpoint.c.last_operation_created_at, checkpoint.c.last_operation_id),
+            ),
+        ),
+    )
+    deltas = (
+        select(
+            cast(func.coalesce(func.sum(signed_amount()), 0), BigInteger).label("delta"),
+            cast(
+                func.coalesce(func.sum(signed_amount()).filter(Operation.created_at < horizon), 0), BigInteger
+            ).label("safe_delta"),
+        )
+        .where(after_checkpoint)
+        .lateral("deltas")
+    )
+    last_safe = (
+        select(Operation.created_at, Operation.id)
+        .where(after_checkpoint, Operation.created_at < horizon)
+        .order_by(Operation.created_at.desc(), Operation.id.desc())
+        .limit(1)
+        .lateral("last_safe")
+    )
+    stmt = (
+        select(
+            Wallet.id.label("wallet_id"),
+            _total_balance(),
+            func.coalesce(checkpoint.c.balance, 0).label("checkpoint_balance"),
+            checkpoint.c.last_operation_created_at,
+            checkpoint.c.last_operation_id,
+            deltas.c.delta,
+            deltas.c.safe_delta,
+            last_safe.c.created_at.label("last_safe_created_at"),
+            last_safe.c.id.label("last_safe_id"),
+        )
+        .select_from(Wallet)
+        .outerjoin(checkpoint, checkpoint.c.wallet_id == Wallet.id)
+        .join(deltas, true())
+        .outerjoin(last_safe, true())
+        .where(Wallet.id == any_(ids))
+        .order_by(Wallet.id)
+    )
+    res = await session.execute(stmt)
+    return [row._asdict() for row in res]
+
+
+async def save_checkpoints(session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    stmt = insert(WalletCheckpoint)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WalletCheckpoint.wallet_id],
+        set_={
+            "balance": stmt.excluded.balance,
+            "last_operation_created_at": stmt.excluded.last_operation_created_at,
+            "last_operation_id": stmt.excluded.last_operation_id,
+            "verified_at": func.now(),
+        },
+    )
+    await session.execute(stmt, rows)
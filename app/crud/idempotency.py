@@ -0,0 +1,47 @@
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from app.models.idempotency import IdempotencyKey
+from app.models.enums import OperationType
+
+
+async def read_idempotency_key(session: AsyncSession, key: str) -> Optional[IdempotencyKey]:
+    stmt = select(IdempotencyKey).where(IdempotencyKey.key == key)
+    res = await session.execute(stmt)
+    return res.scalar_one_or_none()
+
+
+async def claim_idempotency_key(
+    session: AsyncSession,
+    key: str,
+    wallet_id: UUID,
+    operation_type: OperationType,
+    amount: int,
+) -> bool:
+    # Waits for a concurrent transaction holding the same key; False if that one has committed it.
+    stmt = (
+        insert(IdempotencyKey)
+        .values(key=key, wallet_id=wallet_id, operation_type=operation_type, amount=amount)
+        .on_conflict_do_nothing(index_elements=[IdempotencyKey.key])
+        .returning(IdempotencyKey.key)
+    )
+    res = await session.execute(stmt)
+    return res.scalar_one_or_none() is not None
+
+
+async def store_idempotency_result(
+    session: AsyncSession,
+    key: str,
+    response: Optional[dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    stmt = (
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(response=response, error=error)
+    )
+    await session.execute(stmt)
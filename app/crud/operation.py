@@ -1,37 +1,124 @@
-from decimal import Decimal
-from typing import List, cast
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import case, insert, literal, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from app.models.operation import Operation
+from app.models.wallet import Wallet
 from app.models.enums import OperationType
 
 
+def signed_amount():
+    # Effect of an operation on the balance of its wallet.
+    return case(
+        (Operation.operation_type.in_([OperationType.WITHDRAW, OperationType.TRANSFER_OUT]), -Operation.amount),
+        else_=Operation.amount,
+    )
+
+
 async def create_operation(
     session: AsyncSession,
     wallet_id: UUID,
     operation_type: OperationType,
-    amount: Decimal,
+    amount: int,
 ) -> Operation:
     op = Operation(wallet_id=wallet_id, operation_type=operation_type, amount=amount)
     session.add(op)
     return op
 
 
+async def create_operations(session: AsyncSession, rows: List[Dict[str, Any]]) -> List[Operation]:
+    if not rows:
+        return []
+    stmt = insert(Operation).returning(Operation, sort_by_parameter_order=True)
+    res = await session.scalars(stmt, rows)
+    return list(res.all())
+
+
 async def list_operations_by_wallet(
     session: AsyncSession,
     wallet_id: UUID,
     limit: int = 100,
-    offset: int = 0,
-) -> List[Operation]:
+    after: Optional[Tuple[datetime, UUID]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    # Plain rows with the fields of OperationRead, they are serialized without building ORM objects.
+    # Bounds on created_at let Postgres skip monthly partitions outside of them.
     stmt = (
-        select(Operation)
+        select(
+            Operation.operation_type,
+            Operation.amount,
+            Operation.id,
+            Operation.wallet_id,
+            Operation.created_at,
+            Operation.transfer_id,
+        )
         .where(Operation.wallet_id == wallet_id)
-        .order_by(Operation.created_at.desc())
+        .order_by(Operation.created_at.desc(), Operation.id.desc())
         .limit(limit)
-        .offset(offset)
     )
+    if after is not None:
+        # The row comparison alone doesn't prune partitions, the plain bound on created_at does.
+        stmt = stmt.where(Operation.created_at <= after[0], tuple_(Operation.created_at, Operation.id) < tuple_(*after))
+    if since is not None:
+        stmt = stmt.where(Operation.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Operation.created_at < until)
     res = await session.execute(stmt)
-    return cast(List[Operation], res.scalars().all())
+    return [row._asdict() for row in res]
+
+
+async def apply_operation_conditionally(
+    session: AsyncSession,
+    wallet_id: UUID,
+    operation_type: OperationType,
+    amount: int,
+) -> Tuple[Optional[Operation], Optional[int]]:
+    # Returns the created operation (None when the wallet is missing, striped or has insufficient funds)
+    # and the wallet's stripe count (None when the wallet is missing).
+    conditions = [Wallet.id == wallet_id, Wallet.stripe_count == 0]
+    if operation_type is OperationType.WITHDRAW:
+        conditions.append(Wallet.balance >= amount)
+        new_balance = Wallet.balance - amount
+    else:
+        new_balance = Wallet.balance + amount
+    updated_wallet = (
+        update(Wallet)
+        .where(*conditions)
+        .values(balance=new_balance, version=Wallet.version + 1)
+        .returning(Wallet.id)
+        .cte("updated_wallet")
+    )
+    op_id = uuid4()
+    inserted_operation = (
+        insert(Operation)
+        .from_select(
+            ["id", "wallet_id", "operation_type", "amount"],
+            select(
+                literal(op_id, Operation.id.type),
+                updated_wallet.c.id,
+                literal(operation_type, Operation.operation_type.type),
+                literal(amount, Operation.amount.type),
+            ),
+        )
+        .returning(Operation.created_at)
+        .cte("inserted_operation")
+    )
+    stmt = select(
+        select(Wallet.stripe_count).where(Wallet.id == wallet_id).scalar_subquery().label("stripe_count"),
+        select(inserted_operation.c.created_at).scalar_subquery().label("created_at"),
+    )
+    row = (await session.execute(stmt)).one()
+    if row.created_at is None:
+        return None, row.stripe_count
+    op = Operation(
+        id=op_id,
+        wallet_id=wallet_id,
+        operation_type=operation_type,
+        amount=amount,
+        created_at=row.created_at,
+    )
+    return op, 0
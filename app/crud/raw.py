@@ -0,0 +1,66 @@
+from typing import Optional
+
+from asyncpg import Connection, Record
+from uuid import UUID
+
+from app.models.enums import OperationType
+
+
+# Plain SQL for the hot paths, executed on the asyncpg connection directly. asyncpg prepares each statement
+# once per connection and reuses it from its statement cache, and rows come back as Records, without ORM objects.
+
+APPLY_OPERATION_SQL = {
+    OperationType.DEPOSIT: """
+WITH updated_wallet AS (
+    UPDATE wallets SET balance = balance + $3, version = version + 1
+    WHERE id = $2 AND stripe_count = 0
+    RETURNING id
+), inserted_operation AS (
+    INSERT INTO operations (id, wallet_id, operation_type, amount)
+    SELECT $1, id, 'DEPOSIT', $3 FROM updated_wallet
+    RETURNING created_at
+)
+SELECT (SELECT stripe_count FROM wallets WHERE id = $2) AS stripe_count,
+       (SELECT created_at FROM inserted_operation) AS created_at
+""",
+    OperationType.WITHDRAW: """
+WITH updated_wallet AS (
+    UPDATE wallets SET balance = balance - $3, version = version + 1
+    WHERE id = $2 AND stripe_count = 0 AND balance >= $3
+    RETURNING id
+), inserted_operation AS (
+    INSERT INTO operations (id, wallet_id, operation_type, amount)
+    SELECT $1, id, 'WITHDRAW', $3 FROM updated_wallet
+    RETURNING created_at
+)
+SELECT (SELECT stripe_count FROM wallets WHERE id = $2) AS stripe_count,
+       (SELECT created_at FROM inserted_operation) AS created_at
+""",
+}
+
+READ_WALLET_WITH_BALANCE_SQL = """
+SELECT w.id,
+       w.created_at,
+       w.updated_at,
+       w.balance + CASE WHEN w.stripe_count > 0
+                   THEN (SELECT coalesce(sum(s.balance), 0)::bigint FROM wallet_stripes s WHERE s.wallet_id = w.id)
+                   ELSE 0 END AS balance
+FROM wallets w
+WHERE w.id = $1
+"""
+
+
+async def apply_operation(
+    conn: Connection,
+    operation_id: UUID,
+    wallet_id: UUID,
+    operation_type: OperationType,
+    amount: int,
+) -> Record:
+    # Same contract as crud.operation.apply_operation_conditionally: created_at is None when nothing was applied,
+    # stripe_count is None when the wallet is missing.
+    return await conn.fetchrow(APPLY_OPERATION_SQL[operation_type], operation_id, wallet_id, amount)
+
+
+async def read_wallet_with_balance(conn: Connection, wallet_id: UUID) -> Optional[Record]:
+    return await conn.fetchrow(READ_WALLET_WITH_BALANCE_SQL, wallet_id)
@@ -1,15 +1,47 @@
 from uuid import UUID
-from typing import Optional, List
-from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Optional, List, Iterable, Tuple
 
-from sqlalchemy import select, update
+from sqlalchemy import BigInteger, Row, any_, bindparam, case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.wallet import Wallet
+from app.models.wallet_stripe import WalletStripe
+
+
+def _total_balance():
+    # Striped wallets keep their balance in wallet_stripes; the subquery only runs for them.
+    # sum() of bigint is numeric in Postgres, it is cast back.
+    striped_balance = (
+        select(cast(func.coalesce(func.sum(WalletStripe.balance), 0), BigInteger))
+        .where(WalletStripe.wallet_id == Wallet.id)
+        .scalar_subquery()
+    )
+    return (Wallet.balance + case((Wallet.stripe_count > 0, striped_balance), else_=0)).label("total_balance")
 
 
 async def get_wallet_for_update(session: AsyncSession, wallet_id: UUID) -> Optional[Wallet]:
-    stmt = select(Wallet).where(Wallet.id == wallet_id).with_for_update()
+    stmt = select(Wallet).where(Wallet.id == wallet_id).with_for_update(key_share=True)
+    res = await session.execute(stmt)
+    return res.scalar_one_or_none()
+
+
+async def get_wallets_for_update(session: AsyncSession, wallet_ids: Iterable[UUID]) -> List[Wallet]:
+    # Rows are locked in id order, so concurrent batches over overlapping wallets can't deadlock.
+    ids = bindparam("wallet_ids", sorted(set(wallet_ids)), type_=ARRAY(PG_UUID(as_uuid=True)))
+    stmt = select(Wallet).where(Wallet.id == any_(ids)).order_by(Wallet.id).with_for_update(key_share=True)
+    res = await session.execute(stmt)
+    return list(res.scalars().all())
+
+
+async def get_unstriped_wallet_for_update(session: AsyncSession, wallet_id: UUID) -> Optional[Wallet]:
+    # Optimistic updates bypass the ORM, so a wallet already loaded in the session is refreshed.
+    stmt = (
+        select(Wallet)
+        .where(Wallet.id == wallet_id, Wallet.stripe_count == 0)
+        .with_for_update(key_share=True)
+        .execution_options(populate_existing=True)
+    )
     res = await session.execute(stmt)
     return res.scalar_one_or_none()
 
@@ -20,14 +52,60 @@ async def read_wallet(session: AsyncSession, wallet_id: UUID) -> Optional[Wallet
     return res.scalar_one_or_none()
 
 
-async def read_all_wallets(session: AsyncSession) -> List[Wallet]:
-    stmt = select(Wallet)
+async def read_wallet_version(session: AsyncSession, wallet_id: UUID) -> Optional[Row]:
+    # Plain columns, so the read doesn't go through the identity map and always sees the latest committed row.
+    stmt = select(Wallet.balance, Wallet.version, Wallet.stripe_count).where(Wallet.id == wallet_id)
     res = await session.execute(stmt)
-    return list(res.scalars().all())
+    return res.one_or_none()
+
+
+async def update_balance_if_version(
+    session: AsyncSession,
+    wallet_id: UUID,
+    version: int,
+    new_balance: int,
+) -> bool:
+    # False when the wallet changed since its version was read, or was striped in the meantime.
+    stmt = (
+        update(Wallet)
+        .where(Wallet.id == wallet_id, Wallet.version == version, Wallet.stripe_count == 0)
+        .values(balance=new_balance, version=Wallet.version + 1)
+        .returning(Wallet.id)
+        .execution_options(synchronize_session=False)
+    )
+    res = await session.execute(stmt)
+    return res.scalar_one_or_none() is not None
+
+
+async def read_wallet_with_balance(session: AsyncSession, wallet_id: UUID) -> Optional[Tuple[Wallet, int]]:
+    stmt = select(Wallet, _total_balance()).where(Wallet.id == wallet_id)
+    res = await session.execute(stmt)
+    row = res.one_or_none()
+    return (row[0], row[1]) if row is not None else None
+
+
+async def stream_wallets(
+    session: AsyncSession,
+    after: Optional[UUID] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[Dict[str, Any]]:
+    # Plain rows with the fields of WalletRead, they are serialized without building ORM objects.
+    stmt = (
+        select(Wallet.id, Wallet.created_at, Wallet.updated_at, _total_balance().label("balance"))
+        .order_by(Wallet.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if after is not None:
+        stmt = stmt.where(Wallet.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    res = await session.stream(stmt)
+    async for row in res:
+        yield row._asdict()
 
 
-async def create_wallet(session: AsyncSession, initial_balance: Decimal) -> Wallet:
-    initial_balance = initial_balance.quantize(Decimal("0.01"))
+async def create_wallet(session: AsyncSession, initial_balance: int) -> Wallet:
     wallet = Wallet()
     wallet.balance = initial_balance
     session.add(wallet)
@@ -35,8 +113,7 @@ async def create_wallet(session: AsyncSession, initial_balance: Decimal) -> Wall
     return wallet
 
 
-async def create_wallet_by_id(session: AsyncSession, wallet_id: UUID, initial_balance: Decimal) -> Wallet:
-    initial_balance = initial_balance.quantize(Decimal("0.01"))
+async def create_wallet_by_id(session: AsyncSession, wallet_id: UUID, initial_balance: int) -> Wallet:
     wallet = Wallet()
     wallet.id = wallet_id
     wallet.balance = initial_balance
@@ -45,11 +122,11 @@ async def create_wallet_by_id(session: AsyncSession, wallet_id: UUID, initial_ba
     return wallet
 
 
-async def update_wallet_balance(session: AsyncSession, wallet_id: UUID, new_balance: Decimal) -> Optional[UUID]:
+async def update_wallet_balance(session: AsyncSession, wallet_id: UUID, new_balance: int) -> Optional[UUID]:
     stmt = (
         update(Wallet)
         .where(wallet_id == Wallet.id)
-        .values(balance=new_balance)
+        .values(balance=new_balance, version=Wallet.version + 1)
         .returning(Wallet.id)
     )
     res = await session.execute(stmt)
@@ -58,11 +135,11 @@ async def update_wallet_balance(session: AsyncSession, wallet_id: UUID, new_bala
     return w_id
 
 
-async def increment_wallet_balance(session: AsyncSession, wallet_id: UUID, amount: Decimal) -> Optional[UUID]:
+async def increment_wallet_balance(session: AsyncSession, wallet_id: UUID, amount: int) -> Optional[UUID]:
     stmt = (
         update(Wallet)
         .where(Wallet.id == wallet_id)
-        .values(balance=Wallet.balance + amount)
+        .values(balance=Wallet.balance + amount, version=Wallet.version + 1)
         .returning(Wallet.id)
     )
     res = await session.execute(stmt)
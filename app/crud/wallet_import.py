@@ -0,0 +1,57 @@
+from typing import AsyncIterable, List, Optional, Tuple
+
+from asyncpg import Connection, Record
+from uuid import UUID
+
+
+WALLET_IMPORT_TABLE = "wallet_import"
+
+CREATE_WALLET_IMPORT_TABLE_SQL = f"""
+CREATE TEMPORARY TABLE {WALLET_IMPORT_TABLE} (
+    line bigint NOT NULL,
+    id uuid NOT NULL,
+    balance bigint NOT NULL
+) ON COMMIT DROP
+"""
+
+# The first row of every id is inserted unless the wallet exists; all other rows are duplicates.
+# Returns the number of created wallets and up to $1 duplicates with the lowest lines, sorted by line
+# (one row with null line and id when there are none); the number of duplicates is the rest of the staged rows.
+INSERT_IMPORTED_WALLETS_SQL = f"""
+WITH first_rows AS (
+    SELECT DISTINCT ON (id) line, id, balance FROM {WALLET_IMPORT_TABLE} ORDER BY id, line
+), inserted_wallets AS (
+    INSERT INTO wallets (id, balance)
+    SELECT id, balance FROM first_rows ORDER BY id
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id, balance
+), inserted_checkpoints AS (
+    INSERT INTO wallet_checkpoints (wallet_id, balance)
+    SELECT id, balance FROM inserted_wallets
+), inserted_lines AS (
+    SELECT first_rows.line FROM first_rows JOIN inserted_wallets USING (id)
+), duplicates AS (
+    SELECT line, id FROM {WALLET_IMPORT_TABLE} staged
+    WHERE NOT EXISTS (SELECT FROM inserted_lines WHERE inserted_lines.line = staged.line)
+)
+SELECT imported.count AS imported, sample.line, sample.id
+FROM (SELECT count(*) FROM inserted_wallets) imported
+LEFT JOIN LATERAL (SELECT line, id FROM duplicates ORDER BY line LIMIT $1) sample ON true
+"""
+
+
+async def import_wallets(
+    conn: Connection,
+    rows: AsyncIterable[Tuple[int, UUID, int]],
+    max_duplicates: int,
+) -> Tuple[int, int, List[Record]]:
+    # Rows of (line, id, balance) are streamed with COPY into a temporary table and inserted in one statement.
+    # Returns the numbers of staged rows and created wallets, and the (line, id) of the first duplicates.
+    async with conn.transaction():
+        # COPY lasts as long as the upload, the usual statement timeout doesn't apply.
+        await conn.execute("SET LOCAL statement_timeout = 0")
+        await conn.execute(CREATE_WALLET_IMPORT_TABLE_SQL)
+        status = await conn.copy_records_to_table(WALLET_IMPORT_TABLE, records=rows, columns=["line", "id", "balance"])
+        result = await conn.fetch(INSERT_IMPORTED_WALLETS_SQL, max_duplicates)
+    duplicates = [row for row in result if row["line"] is not None]
+    return int(status.split()[-1]), result[0]["imported"], duplicates
@@ -0,0 +1,60 @@
+from typing import List, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from app.models.wallet_stripe import WalletStripe
+
+
+async def create_stripes(session: AsyncSession, wallet_id: UUID, first_stripe_no: int, stripe_count: int) -> None:
+    if first_stripe_no >= stripe_count:
+        return
+    rows = [
+        {"wallet_id": wallet_id, "stripe_no": stripe_no, "balance": 0}
+        for stripe_no in range(first_stripe_no, stripe_count)
+    ]
+    await session.execute(insert(WalletStripe), rows)
+
+
+async def deposit_to_stripe(session: AsyncSession, wallet_id: UUID, stripe_no: int, amount: int) -> None:
+    # Locks the stripe; a transaction that also withdraws from the wallet must deposit to stripe 0.
+    stmt = (
+        update(WalletStripe)
+        .where(WalletStripe.wallet_id == wallet_id, WalletStripe.stripe_no == stripe_no)
+        .values(balance=WalletStripe.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(stmt)
+
+
+async def withdraw_from_stripes(session: AsyncSession, wallet_id: UUID, stripe_count: int, amount: int) -> bool:
+    # Stripes are locked one by one in stripe_no order until the amount is covered, so withdrawals can't deadlock.
+    # Nothing is changed if the stripes don't cover the amount.
+    plan: List[Tuple[int, int]] = []
+    remaining = amount
+    for stripe_no in range(stripe_count):
+        stmt = (
+            select(WalletStripe.balance)
+            .where(WalletStripe.wallet_id == wallet_id, WalletStripe.stripe_no == stripe_no)
+            .with_for_update(key_share=True)
+        )
+        balance = (await session.execute(stmt)).scalar_one_or_none()
+        if not balance:
+            continue
+        taken = min(balance, remaining)
+        plan.append((stripe_no, taken))
+        remaining -= taken
+        if remaining == 0:
+            break
+    if remaining > 0:
+        return False
+    for stripe_no, taken in plan:
+        stmt = (
+            update(WalletStripe)
+            .where(WalletStripe.wallet_id == wallet_id, WalletStripe.stripe_no == stripe_no)
+            .values(balance=WalletStripe.balance - taken)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(stmt)
+    return True
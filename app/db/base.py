@@ -1,15 +1,32 @@
 from __future__ import annotations
 
-from sqlalchemy import MetaData
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from asyncpg import Connection
+from sqlalchemy import MetaData, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.db.retry import RETRYABLE_SQLSTATES, RetryBudget, RetryPolicy
+from app.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_WAIT, DB_POOL_OVERFLOW
+from app.tracing import install_sql_tracing, record_phase, trace_phase, trace_raw_connection
+
+log = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
 
 naming_convention: dict[str, str] = {
     "ix": "ix_%(column_0_label)s",
@@ -21,36 +38,265 @@ naming_convention: dict[str, str] = {
 
 metadata = MetaData(naming_convention=naming_convention)
 
+# lock_not_available and query_canceled, raised when lock_timeout or statement_timeout is exceeded.
+TIMEOUT_SQLSTATES = {"55P03", "57014"}
+
+# Balance change triggers notify the wallet caches only on connections with this setting on.
+# NOTIFY serializes commits, so it is set only while the cache is enabled.
+WALLET_NOTIFY_SETTING = "wallet.notify_changes"
+
+
+def connect_args() -> dict:
+    return {
+        "server_settings": {
+            "lock_timeout": str(settings.DB_LOCK_TIMEOUT_MS),
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+            WALLET_NOTIFY_SETTING: "on" if settings.WALLET_CACHE_ENABLED else "off",
+        },
+    }
+
 
 class Base(DeclarativeBase):
     metadata = metadata
 
 
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # Reports checkout wait and pool usage, labelled with the engine's pool_logging_name.
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_CHECKOUT_WAIT.labels(pool=self.logging_name).observe(waited)
+            record_phase("pool_wait", waited)
+            self._report_usage()
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._report_usage()
+
+    def _report_usage(self) -> None:
+        DB_POOL_CHECKED_OUT.labels(pool=self.logging_name).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(pool=self.logging_name).set(max(self.overflow(), 0))
+
+
+class DatabaseBusyException(Exception):
+    pass
+
+
+def is_database_busy_error(e: Exception) -> bool:
+    if isinstance(e, (DatabaseBusyException, PoolTimeoutError)):
+        return True
+    if isinstance(e, DBAPIError):
+        e = e.orig
+    # Retryable errors reach here only once their retries are exhausted.
+    return getattr(e, "sqlstate", None) in TIMEOUT_SQLSTATES | RETRYABLE_SQLSTATES
+
+
+class AdmittedSession(AsyncSession):
+    # Holds one of DBConnectionManager's in-flight slots until closed.
+    _admission: asyncio.Semaphore | None = None
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            admission, self._admission = self._admission, None
+            if admission is not None:
+                admission.release()
+
+
 class DBConnectionManager:
-    _engine: AsyncEngine = create_async_engine(
-        settings.DATABASE_URL,
-        echo=settings.SQL_ECHO,
-        pool_size=settings.DB_POOL_SIZE,
-        max_overflow=settings.DB_MAX_OVERFLOW,
-    )
+    # Engines are created on first use or by init_engine() in the app's lifespan, not when the module is imported.
+    _engine: AsyncEngine | None = None
+    _async_session: async_sessionmaker[AsyncSession] | None = None
+    _read_engine: AsyncEngine | None = None
+    _async_read_session: async_sessionmaker[AsyncSession] | None = None
 
-    _async_session: async_sessionmaker[AsyncSession] = async_sessionmaker(
-        bind=_engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-    )
+    _replica_checked_at: float = float("-inf")
+    _replica_is_fresh: bool = True
+
+    _admission: asyncio.Semaphore | None = None
+    _retry_policy: RetryPolicy | None = None
+    _warm: bool = False
+
+    @classmethod
+    def init_engine(cls) -> None:
+        if cls._engine is not None:
+            return
+        engine_args = dict(
+            echo=settings.SQL_ECHO,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            connect_args=connect_args(),
+            poolclass=InstrumentedPool,
+        )
+        cls._engine = create_async_engine(settings.DATABASE_URL, pool_logging_name="primary", **engine_args)
+        cls._async_session = async_sessionmaker(
+            bind=cls._engine,
+            class_=AdmittedSession,
+            expire_on_commit=False,
+        )
+        cls._read_engine = create_async_engine(
+            settings.DATABASE_READ_URL or settings.DATABASE_URL,
+            pool_logging_name="read",
+            execution_options={"postgresql_readonly": True},
+            **engine_args,
+        )
+        install_sql_tracing(cls._engine.sync_engine)
+        install_sql_tracing(cls._read_engine.sync_engine)
+        cls._async_read_session = async_sessionmaker(
+            bind=cls._read_engine,
+            class_=AdmittedSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        if cls._admission is None:
+            cls._admission = asyncio.Semaphore(settings.DB_MAX_IN_FLIGHT)
+        if cls._retry_policy is None:
+            cls._retry_policy = RetryPolicy(
+                max_attempts=settings.DB_RETRY_MAX_ATTEMPTS,
+                base_delay=settings.DB_RETRY_BASE_DELAY_MS / 1000,
+                max_delay=settings.DB_RETRY_MAX_DELAY_MS / 1000,
+                budget=RetryBudget(settings.DB_RETRY_BUDGET_RATIO, settings.DB_RETRY_BUDGET_MAX_TOKENS),
+            )
+
+    @classmethod
+    async def warm_up(
+            cls,
+            connections: int,
+            prepare: Callable[[AsyncConnection, bool], Awaitable[None]],
+    ) -> None:
+        # Opens up to pool_size connections per engine at once and runs prepare(connection, read_only) on each,
+        # so they stay in the pool with their prepared statements cached.
+        cls.init_engine()
+        engines = [(cls._engine, False), (cls._read_engine, True)]
+        async with AsyncExitStack() as stack:
+            async def open_connection(engine: AsyncEngine, read_only: bool) -> None:
+                conn = await stack.enter_async_context(engine.connect())
+                await prepare(conn, read_only)
+
+            await asyncio.gather(*(
+                open_connection(engine, read_only)
+                for engine, read_only in engines
+                for _ in range(min(connections, settings.DB_POOL_SIZE))
+            ))
+        cls._warm = True
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._warm
 
     @classmethod
     async def get_session(cls):
-        return cls._async_session()
+        cls.init_engine()
+        return await cls._admit(cls._async_session)
 
     @classmethod
-    async def execute(cls, func):
-        async with cls._async_session() as session:
-            async with session.begin():
-                await func(session)
+    async def get_read_session(cls):
+        cls.init_engine()
+        if settings.DATABASE_READ_URL and not await cls._check_replica_freshness():
+            return await cls._admit(cls._async_session)
+        return await cls._admit(cls._async_read_session)
 
     @classmethod
-    async def dispose_engine(cls):
-        await cls._engine.dispose()
+    @asynccontextmanager
+    async def get_raw_connection(cls, read_only: bool = False) -> AsyncIterator[Connection]:
+        # asyncpg connection from the engine's pool, outside of a transaction: each statement commits on its own.
+        cls.init_engine()
+        engine = cls._engine
+        if read_only and (not settings.DATABASE_READ_URL or await cls._check_replica_freshness()):
+            engine = cls._read_engine
+        await cls._acquire_admission()
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                with trace_raw_connection(raw.driver_connection):
+                    yield raw.driver_connection
+        finally:
+            cls._admission.release()
+
+    @classmethod
+    async def _admit(cls, session_factory: async_sessionmaker[AsyncSession]) -> AsyncSession:
+        await cls._acquire_admission()
+        session = session_factory()
+        session._admission = cls._admission
+        return session
+
+    @classmethod
+    async def _acquire_admission(cls) -> None:
+        # Under overload requests are rejected instead of queueing for the pool.
+        try:
+            with trace_phase("admission_wait"):
+                await asyncio.wait_for(cls._admission.acquire(), settings.DB_ADMISSION_TIMEOUT_SECONDS)
+        except TimeoutError:
+            raise DatabaseBusyException()
+
+    @classmethod
+    async def _check_replica_freshness(cls) -> bool:
+        now = time.monotonic()
+        if now - cls._replica_checked_at < settings.DB_READ_STALENESS_CHECK_INTERVAL_SECONDS:
+            return cls._replica_is_fresh
+        cls._replica_checked_at = now
+        try:
+            async with cls._read_engine.connect() as conn:
+                lag = (await conn.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+                ))).scalar()
+        except DBAPIError:
+            log.warning("Replica is unavailable, reading from primary.", exc_info=True)
+            cls._replica_is_fresh = False
+        else:
+            cls._replica_is_fresh = lag is not None and lag <= settings.DB_READ_MAX_STALENESS_SECONDS
+            if not cls._replica_is_fresh:
+                log.warning("Replica lag %s s exceeds staleness budget, reading from primary.", lag)
+        return cls._replica_is_fresh
+
+    @classmethod
+    async def run_transaction(
+            cls,
+            work: Callable[[AsyncSession], Awaitable[T]],
+            isolation_level: Optional[str] = None,
+    ) -> T:
+        # Runs work(session) in a transaction, again from the start in a new one when it fails with a retryable error.
+        # Anything work() does outside of the session must be safe to repeat.
+        cls.init_engine()
+        isolation_level = isolation_level or settings.DB_ISOLATION_LEVEL
+
+        async def attempt() -> T:
+            async with await cls.get_session() as session:
+                with trace_phase("transaction"):
+                    async with session.begin():
+                        if isolation_level is not None:
+                            await session.connection(execution_options={"isolation_level": isolation_level})
+                        return await work(session)
+
+        return await cls._retry_policy.run(attempt)
+
+    @classmethod
+    async def run_raw(cls, work: Callable[[Connection], Awaitable[T]], read_only: bool = False) -> T:
+        # Like run_transaction() for statements run in autocommit on a raw connection.
+        cls.init_engine()
+
+        async def attempt() -> T:
+            async with cls.get_raw_connection(read_only) as conn:
+                return await work(conn)
 
+        return await cls._retry_policy.run(attempt)
+
+    @classmethod
+    async def execute(cls, func, isolation_level: Optional[str] = None):
+        return await cls.run_transaction(func, isolation_level)
+
+    @classmethod
+    async def dispose_engine(cls):
+        cls._warm = False
+        if cls._engine is None:
+            return
+        engine, read_engine = cls._engine, cls._read_engine
+        cls._engine = cls._async_session = cls._read_engine = cls._async_read_session = None
+        await engine.dispose()
+        await read_engine.dispose()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+
+from app.metrics import DB_TRANSACTION_RETRIES, DB_TRANSACTION_RETRIES_EXHAUSTED
+from app.tracing import trace_phase
+
+log = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+# deadlock_detected, serialization_failure and lock_not_available: the transaction was rolled back
+# and running it again from the start can succeed.
+RETRYABLE_SQLSTATES = {"40P01", "40001", "55P03"}
+
+
+def retryable_sqlstate(e: BaseException) -> Optional[str]:
+    if isinstance(e, DBAPIError):
+        e = e.orig
+    sqlstate = getattr(e, "sqlstate", None)
+    return sqlstate if sqlstate in RETRYABLE_SQLSTATES else None
+
+
+class RetryBudget:
+    # Every first attempt deposits `ratio` of a token and every retry withdraws a whole one, so retries
+    # stay within that share of the traffic and can't multiply the load when the database is struggling.
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+
+    def deposit(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    def __init__(
+            self,
+            max_attempts: int,
+            base_delay: float,
+            max_delay: float,
+            budget: RetryBudget,
+            sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._sleep = sleep
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter, so transactions that failed together don't collide again on the next attempt.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def run(self, attempt_once: Callable[[], Awaitable[T]]) -> T:
+        # attempt_once must run the whole unit of work in a new transaction each time it is called.
+        # Errors come either wrapped by SQLAlchemy or straight from asyncpg on raw connections.
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return await attempt_once()
+            except Exception as e:
+                sqlstate = retryable_sqlstate(e)
+                if sqlstate is None:
+                    raise
+                if attempt >= self.max_attempts:
+                    DB_TRANSACTION_RETRIES_EXHAUSTED.labels(sqlstate=sqlstate, reason="attempts").inc()
+                    raise
+                if not self.budget.withdraw():
+                    DB_TRANSACTION_RETRIES_EXHAUSTED.labels(sqlstate=sqlstate, reason="budget").inc()
+                    raise
+                DB_TRANSACTION_RETRIES.labels(sqlstate=sqlstate).inc()
+                log.debug("Transaction failed with %s, retrying (attempt %s).", sqlstate, attempt)
+            with trace_phase("retry_backoff"):
+                await self._sleep(self.delay(attempt))
+            attempt += 1
@@ -1,38 +1,91 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator
 
-from fastapi import FastAPI
+from asyncpg import PostgresError
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 
 from app.config import settings
 from app.api.v1.routes import router
-from app.db.base import DBConnectionManager
+from app.db.base import DBConnectionManager, DatabaseBusyException, is_database_busy_error
+from app.metrics import CONTENT_TYPE_LATEST, PrometheusMiddleware, mark_process_dead, render_metrics
+from app.services.reconciliation import get_reconciliation_scheduler
+from app.services.warmup import warm_up_pool
+from app.services.wallet_service import get_wallet_cache, get_wallet_cache_invalidator
+from app.tracing import TracingMiddleware
 
 
 log = logging.getLogger("uvicorn.error")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    log.info("Starting application.")
+    DBConnectionManager.init_engine()
+    # Requests are served meanwhile, /ready reports 503 until the pool is warm.
+    warming = asyncio.create_task(warm_up_pool())
+    if settings.WALLET_CACHE_ENABLED:
+        get_wallet_cache_invalidator().start()
+        log.info("Wallet cache enabled.")
+    if settings.RECONCILIATION_INTERVAL_SECONDS > 0:
+        get_reconciliation_scheduler().start()
+        log.info("Balance reconciliation every %s seconds.", settings.RECONCILIATION_INTERVAL_SECONDS)
+    try:
+        yield
+    finally:
+        log.info("Shutting down application.")
+        warming.cancel()
+        with suppress(asyncio.CancelledError):
+            await warming
+        await get_wallet_cache_invalidator().stop()
+        await get_reconciliation_scheduler().stop()
+        await DBConnectionManager.dispose_engine()
+        log.info("Engine disposed.")
+        mark_process_dead()
+
+
 def create_app() -> FastAPI:
     title = settings.APP_NAME
     version = settings.APP_VERSION
     enable_docs = settings.ENABLE_OPENAPI_DOCS
 
-    app = FastAPI(title=title, version=version, docs_url="/docs" if enable_docs else None)
+    app = FastAPI(title=title, version=version, docs_url="/docs" if enable_docs else None, lifespan=lifespan)
     app.include_router(router)
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(PrometheusMiddleware)
 
-    @app.on_event("startup")
-    async def on_startup() -> None:
-        log.info("Starting application.")
+    async def database_busy(request: Request, exc: Exception) -> JSONResponse:
+        if not is_database_busy_error(exc):
+            raise exc
+        log.warning("Database is busy (%s), rejecting %s %s.", type(exc).__name__, request.method, request.url.path)
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Service is overloaded, retry later."},
+            headers={"Retry-After": str(settings.RETRY_AFTER_SECONDS)},
+        )
 
-    @app.on_event("shutdown")
-    async def on_shutdown() -> None:
-        log.info("Shutting down application.")
-        await DBConnectionManager.dispose_engine()
-        log.info("Engine disposed.")
+    for exc_class in (DatabaseBusyException, PoolTimeoutError, DBAPIError, PostgresError):
+        app.add_exception_handler(exc_class, database_busy)
 
     @app.get("/")
     async def root() -> dict[str, str]:
         return {"status": "ok", "app": title}
 
-    return app
+    @app.get("/ready")
+    async def ready() -> JSONResponse:
+        if not DBConnectionManager.is_ready():
+            return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "warming up"})
+        return JSONResponse({"status": "ready"})
 
+    @app.get("/cache/stats")
+    async def cache_stats() -> dict[str, int]:
+        return get_wallet_cache().stats()
 
-app = create_app()
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+    return app
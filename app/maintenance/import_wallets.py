@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, List, Optional
+
+from app.db.base import DBConnectionManager
+from app.services.wallet_import import CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, WalletImportFormatException, parse_wallet_rows
+from app.services.wallet_service import WalletService
+
+
+FORMATS = {"csv": CSV_MEDIA_TYPE, "ndjson": NDJSON_MEDIA_TYPE}
+
+
+async def read_chunks(file: BinaryIO, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    while chunk := await asyncio.to_thread(file.read, chunk_size):
+        yield chunk
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create wallets from a CSV (id,balance) or NDJSON file.")
+    parser.add_argument("path", help="File to import, - for stdin.")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or Path(args.path).suffix.lstrip(".").lower()
+    if file_format not in FORMATS:
+        parser.error("can't tell the format from the file name, use --format")
+
+    with (open(args.path, "rb") if args.path != "-" else sys.stdin.buffer) as file:
+        try:
+            result = await WalletService(DBConnectionManager()).import_wallets(
+                parse_wallet_rows(read_chunks(file), FORMATS[file_format])
+            )
+        except WalletImportFormatException as e:
+            print(e, file=sys.stderr)
+            return 1
+        finally:
+            await DBConnectionManager.dispose_engine()
+    print(f"Imported {result.imported} wallets, {result.duplicate_count} duplicates.")
+    for duplicate in result.duplicates:
+        print(f"DUPLICATE line {duplicate.line}: {duplicate.id}")
+    if result.duplicate_count > len(result.duplicates):
+        print(f"... {result.duplicate_count - len(result.duplicates)} more duplicates not shown.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import gzip
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.models.operation import OPERATIONS_DEFAULT_PARTITION
+
+
+# operations is partitioned by created_at month, one table per month named operations_pYYYYMM.
+PARTITION_PREFIX = "operations_p"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m").date()
+    except ValueError:
+        return None
+
+
+def _bound(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+async def list_partitions(conn: asyncpg.Connection) -> List[str]:
+    rows = await conn.fetch(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'operations'::regclass ORDER BY c.relname"
+    )
+    return [row["relname"] for row in rows]
+
+
+async def create_partitions(conn: asyncpg.Connection, months_ahead: int, today: date) -> List[str]:
+    # Rows of the month that already landed in the default partition are moved to the new one.
+    existing = set(await list_partitions(conn))
+    created = []
+    current = month_start(today)
+    for month in (add_months(current, i) for i in range(months_ahead + 1)):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        lower, upper = _bound(month), _bound(add_months(month, 1))
+        async with conn.transaction():
+            await conn.execute(f'CREATE TABLE "{name}" (LIKE operations INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            await conn.execute(
+                f'WITH moved AS ('
+                f'DELETE FROM "{OPERATIONS_DEFAULT_PARTITION}" WHERE created_at >= $1 AND created_at < $2 RETURNING *'
+                f') INSERT INTO "{name}" SELECT * FROM moved',
+                lower,
+                upper,
+            )
+            await conn.execute(
+                f"ALTER TABLE operations ATTACH PARTITION \"{name}\" "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        created.append(name)
+    return created
+
+
+async def detach_partitions(
+        conn: asyncpg.Connection,
+        older_than_months: int,
+        today: date,
+        archive_dir: Optional[Path] = None,
+) -> List[str]:
+    # Detaches partitions whose whole month is older than the cutoff. With archive_dir they are dumped
+    # to <archive_dir>/<partition>.csv.gz and dropped, otherwise left in place as standalone tables.
+    cutoff = add_months(month_start(today), -older_than_months)
+    detached = []
+    for name in await list_partitions(conn):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        if archive_dir is not None:
+            await archive_partition(conn, name, archive_dir)
+        async with conn.transaction():
+            await conn.execute(f'ALTER TABLE operations DETACH PARTITION "{name}"')
+            if archive_dir is not None:
+                await conn.execute(f'DROP TABLE "{name}"')
+        detached.append(name)
+    return detached
+
+
+async def archive_partition(conn: asyncpg.Connection, name: str, archive_dir: Path) -> Path:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.csv.gz"
+    partial = path.with_name(path.name + ".partial")
+    with gzip.open(partial, "wb") as archive:
+        async def write(chunk: bytes) -> None:
+            archive.write(chunk)
+
+        await conn.copy_from_table(name, output=write, format="csv", header=True)
+    partial.rename(path)
+    return path
+
+
+async def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintenance of monthly partitions of the operations table.")
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL from settings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Create partitions for the current and upcoming months.")
+    create.add_argument("--months-ahead", type=int, default=3)
+    detach = commands.add_parser("detach", help="Detach partitions older than given number of months.")
+    detach.add_argument("--older-than-months", type=int, required=True)
+    detach.add_argument("--archive-dir", type=Path, help="Dump detached partitions here as csv.gz and drop them.")
+    args = parser.parse_args(argv)
+
+    url = make_url(args.database_url or settings.DATABASE_URL).set(drivername="postgresql")
+    conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+    try:
+        today = datetime.now(timezone.utc).date()
+        if args.command == "create":
+            names = await create_partitions(conn, args.months_ahead, today)
+            print(f"Created partitions: {', '.join(names) or 'none'}")
+        else:
+            names = await detach_partitions(conn, args.older_than_months, today, args.archive_dir)
+            action = "Archived and dropped" if args.archive_dir is not None else "Detached"
+            print(f"{action} partitions: {', '.join(names) or 'none'}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
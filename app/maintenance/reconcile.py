@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from app.config import settings
+from app.db.base import DBConnectionManager
+from app.schemas.money import from_minor_units
+from app.services.reconciliation import Reconciler
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check wallet balances against operations added since checkpoints.")
+    parser.add_argument("--batch-size", type=int, default=settings.RECONCILIATION_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.RECONCILIATION_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    try:
+        report = await Reconciler(DBConnectionManager, args.batch_size, args.concurrency).run()
+    finally:
+        await DBConnectionManager.dispose_engine()
+    if report is None:
+        print("Another reconciliation is running.")
+        return 2
+    print(
+        f"Checked {report.checked_wallets} wallets up to {report.horizon.isoformat()}, "
+        f"advanced {report.advanced_checkpoints} checkpoints."
+    )
+    for drift in report.drifted:
+        print(
+            f"DRIFT {drift.wallet_id}: "
+            f"balance {from_minor_units(drift.balance)}, ledger {from_minor_units(drift.expected_balance)}"
+        )
+    return 1 if report.drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
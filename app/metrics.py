@@ -0,0 +1,143 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# With several uvicorn workers PROMETHEUS_MULTIPROC_DIR must be set (and emptied) before they start,
+# every worker then writes its values to files there and /metrics aggregates them.
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+LOCK_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests.",
+    ["method", "route", "status"],
+)
+
+OPERATION_TRANSACTION_DURATION = Histogram(
+    "wallet_operation_transaction_duration_seconds",
+    "Duration of transactions applying operations to a wallet.",
+)
+
+WALLET_LOCK_WAIT = Histogram(
+    "wallet_lock_wait_seconds",
+    "Time spent acquiring the wallet row lock.",
+    buckets=LOCK_WAIT_BUCKETS,
+)
+
+OPERATION_OUTCOMES = Counter(
+    "wallet_operation_outcomes",
+    "Results of operations applied to wallets.",
+    ["outcome"],
+)
+
+WALLET_VERSION_CONFLICTS = Counter(
+    "wallet_version_conflicts",
+    "Optimistic balance updates that found the wallet changed since it was read.",
+)
+
+WALLET_OPTIMISTIC_FALLBACKS = Counter(
+    "wallet_optimistic_fallbacks",
+    "Operations that locked the wallet after too many optimistic conflicts.",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections opened over the pool size.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+    ["pool"],
+    buckets=LOCK_WAIT_BUCKETS,
+)
+
+DB_TRANSACTION_RETRIES = Counter(
+    "db_transaction_retries",
+    "Transactions run again after a deadlock, serialization failure or lock timeout.",
+    ["sqlstate"],
+)
+
+DB_TRANSACTION_RETRIES_EXHAUSTED = Counter(
+    "db_transaction_retries_exhausted",
+    "Retryable transaction failures returned to the caller, by the limit that stopped the retries.",
+    ["sqlstate", "reason"],
+)
+
+RECONCILIATION_DURATION = Histogram(
+    "wallet_reconciliation_duration_seconds",
+    "Duration of balance reconciliation runs.",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+
+RECONCILIATION_DRIFTED_WALLETS = Gauge(
+    "wallet_reconciliation_drifted_wallets",
+    "Wallets whose balance didn't match the ledger in the last reconciliation run.",
+    multiprocess_mode="livemax",
+)
+
+
+def render_metrics() -> bytes:
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class PrometheusMiddleware:
+    # Labels requests by route template, not by path, so wallet ids don't multiply the series.
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=status,
+            ).observe(time.perf_counter() - started)
+
@@ -1,3 +1,5 @@
 import app.models.wallet
 import app.models.operation
-
+import app.models.idempotency
+import app.models.wallet_stripe
+import app.models.checkpoint
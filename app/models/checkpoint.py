@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    BigInteger,
+    ForeignKey,
+    DateTime,
+    func,
+)
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from uuid import UUID
+
+from app.db.base import Base
+
+
+class WalletCheckpoint(Base):
+    # Balance verified against the ledger up to and including operation (last_operation_created_at, last_operation_id);
+    # both are NULL while no operation is covered yet, then balance is the initial balance of the wallet.
+    __tablename__ = "wallet_checkpoints"
+
+    wallet_id: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("wallets.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+
+    balance: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+    )
+
+    last_operation_created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    last_operation_id: Mapped[Optional[UUID]] = mapped_column(
+        PG_UUID(as_uuid=True),
+        nullable=True,
+    )
+
+    verified_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"<WalletCheckpoint wallet_id={self.wallet_id}, balance={self.balance}>"
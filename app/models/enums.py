@@ -4,6 +4,9 @@ from enum import Enum
 class OperationType(str, Enum):
     DEPOSIT = "DEPOSIT"
     WITHDRAW = "WITHDRAW"
+    # Legs of a transfer, written only by WalletService.transfer.
+    TRANSFER_OUT = "TRANSFER_OUT"
+    TRANSFER_IN = "TRANSFER_IN"
 
     @classmethod
     def __str__(cls):
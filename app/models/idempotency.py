@@ -0,0 +1,66 @@
+from typing import Any, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    ForeignKey,
+    Enum as PG_Enum,
+    DateTime,
+    String,
+    func,
+)
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+
+from uuid import UUID
+
+from app.models.enums import OperationType
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(
+        String(255),
+        primary_key=True,
+        nullable=False,
+    )
+
+    wallet_id: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("wallets.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    operation_type: Mapped[OperationType] = mapped_column(
+        PG_Enum(OperationType, name="operation_type_enum"),
+        nullable=False,
+    )
+
+    amount: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+    )
+
+    response: Mapped[Optional[dict[str, Any]]] = mapped_column(
+        JSONB,
+        nullable=True,
+    )
+
+    error: Mapped[Optional[str]] = mapped_column(
+        String(64),
+        nullable=True,
+    )
+
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def matches(self, wallet_id: UUID, operation_type: OperationType, amount: int) -> bool:
+        return self.wallet_id == wallet_id and self.operation_type is operation_type and self.amount == amount
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey key={self.key}, wallet_id={self.wallet_id}, error={self.error}>"
@@ -1,12 +1,15 @@
-from decimal import Decimal
+from typing import Optional
 
 from sqlalchemy import (
+    BigInteger,
+    DDL,
     ForeignKey,
     Enum as PG_Enum,
-    Numeric,
     DateTime,
     func,
     CheckConstraint,
+    Index,
+    event,
 )
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
@@ -19,10 +22,15 @@ from app.models.enums import OperationType
 from app.db.base import Base
 
 
+OPERATIONS_DEFAULT_PARTITION = "operations_default"
+
+
 class Operation(Base):
     __tablename__ = "operations"
     __table_args__ = (
         CheckConstraint("amount > 0", name="ck_operation_amount_positive"),
+        # Monthly partitions are managed by app.maintenance.partitions; the primary key has to include created_at.
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
     id: Mapped[UUID] = mapped_column(
@@ -43,13 +51,20 @@ class Operation(Base):
         nullable=False,
     )
 
-    amount: Mapped[Decimal] = mapped_column(
-        Numeric(20, 2),
+    amount: Mapped[int] = mapped_column(
+        BigInteger,
         nullable=False,
     )
 
+    # Shared by both legs of a transfer.
+    transfer_id: Mapped[Optional[UUID]] = mapped_column(
+        PG_UUID(as_uuid=True),
+        nullable=True,
+    )
+
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         server_default=func.now(),
     )
@@ -63,3 +78,28 @@ class Operation(Base):
     def __repr__(self) -> str:
         return f"<Operation id={self.id}, type={self.operation_type}, amount={self.amount}>"
 
+
+Index(
+    "ix_operations_wallet_id_created_at_id",
+    Operation.wallet_id,
+    Operation.created_at.desc(),
+    Operation.id.desc(),
+    postgresql_include=["operation_type", "amount"],
+)
+
+# Exports of the whole ledger in created_at, id order.
+Index("ix_operations_created_at_id", Operation.created_at, Operation.id)
+
+Index(
+    "ix_operations_transfer_id",
+    Operation.transfer_id,
+    postgresql_where=Operation.transfer_id.isnot(None),
+)
+
+
+# Rows outside of the monthly partitions land here, so inserts never fail for a missing partition.
+create_operations_default_partition = DDL(
+    f"CREATE TABLE {OPERATIONS_DEFAULT_PARTITION} PARTITION OF operations DEFAULT"
+)
+
+event.listen(Operation.__table__, "after_create", create_operations_default_partition)
@@ -1,18 +1,23 @@
 from sqlalchemy import (
+    BigInteger,
+    DDL,
     CheckConstraint,
     DateTime,
-    Numeric,
+    Integer,
+    event,
     func,
 )
 
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 
-from decimal import Decimal
 from uuid import uuid4, UUID
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
-from app.db.base import Base
+from app.db.base import WALLET_NOTIFY_SETTING, Base
+
+
+WALLET_CHANGED_CHANNEL = "wallet_changed"
 
 
 class Wallet(Base):
@@ -28,8 +33,9 @@ class Wallet(Base):
         default=uuid4,
     )
 
-    balance: Mapped[Decimal] = mapped_column(
-        Numeric(20, 2),
+    # In minor units, like every amount in the database.
+    balance: Mapped[int] = mapped_column(
+        BigInteger,
         nullable=False,
         default=0,
     )
@@ -47,6 +53,46 @@ class Wallet(Base):
         server_onupdate=func.now(),
     )
 
+    # Number of wallet_stripes rows holding the balance; 0 means the balance is kept in this row only.
+    stripe_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
+    # Bumped by every change of the row, APPLY_OPERATION_MODE=optimistic updates the balance only if it hasn't moved.
+    # The ORM checks and increments it on flush, statements updating wallets directly must increment it themselves.
+    version: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default="0",
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self) -> str:
         return f"<Wallet id={self.id}, balance={self.balance}>"
 
+
+# Workers keep cached balances; committed balance changes are announced to them on this channel.
+create_notify_wallet_changed_function = DDL(
+    "CREATE OR REPLACE FUNCTION notify_wallet_changed() RETURNS trigger AS $$ "
+    "BEGIN "
+    f"IF current_setting('{WALLET_NOTIFY_SETTING}', true) = 'on' THEN "
+    f"PERFORM pg_notify('{WALLET_CHANGED_CHANNEL}', NEW.id::text); "
+    "END IF; "
+    "RETURN NULL; "
+    "END; "
+    "$$ LANGUAGE plpgsql"
+)
+
+create_notify_wallet_changed_trigger = DDL(
+    "CREATE TRIGGER trg_wallets_notify_changed "
+    "AFTER UPDATE OF balance ON wallets "
+    "FOR EACH ROW WHEN (OLD.balance IS DISTINCT FROM NEW.balance) "
+    "EXECUTE FUNCTION notify_wallet_changed()"
+)
+
+event.listen(Wallet.__table__, "after_create", create_notify_wallet_changed_function)
+event.listen(Wallet.__table__, "after_create", create_notify_wallet_changed_trigger)
@@ -0,0 +1,67 @@
+from sqlalchemy import (
+    BigInteger,
+    DDL,
+    CheckConstraint,
+    ForeignKey,
+    Integer,
+    event,
+)
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from uuid import UUID
+
+from app.db.base import WALLET_NOTIFY_SETTING, Base
+from app.models.wallet import WALLET_CHANGED_CHANNEL
+
+
+class WalletStripe(Base):
+    __tablename__ = "wallet_stripes"
+    __table_args__ = (
+        CheckConstraint("balance >= 0", name="ck_wallet_stripes_balance_non_negative"),
+    )
+
+    wallet_id: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("wallets.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+
+    stripe_no: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        nullable=False,
+    )
+
+    balance: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    def __repr__(self) -> str:
+        return f"<WalletStripe wallet_id={self.wallet_id}, stripe_no={self.stripe_no}, balance={self.balance}>"
+
+
+create_notify_wallet_stripe_changed_function = DDL(
+    "CREATE OR REPLACE FUNCTION notify_wallet_stripe_changed() RETURNS trigger AS $$ "
+    "BEGIN "
+    f"IF current_setting('{WALLET_NOTIFY_SETTING}', true) = 'on' THEN "
+    f"PERFORM pg_notify('{WALLET_CHANGED_CHANNEL}', NEW.wallet_id::text); "
+    "END IF; "
+    "RETURN NULL; "
+    "END; "
+    "$$ LANGUAGE plpgsql"
+)
+
+create_notify_wallet_stripe_changed_trigger = DDL(
+    "CREATE TRIGGER trg_wallet_stripes_notify_changed "
+    "AFTER UPDATE OF balance ON wallet_stripes "
+    "FOR EACH ROW WHEN (OLD.balance IS DISTINCT FROM NEW.balance) "
+    "EXECUTE FUNCTION notify_wallet_stripe_changed()"
+)
+
+event.listen(WalletStripe.__table__, "after_create", create_notify_wallet_stripe_changed_function)
+event.listen(WalletStripe.__table__, "after_create", create_notify_wallet_stripe_changed_trigger)
@@ -0,0 +1,22 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+
+class InvalidCursorException(Exception):
+    pass
+
+
+def encode_operation_cursor(created_at: datetime, operation_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{operation_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_operation_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, operation_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(operation_id)
+    except ValueError as e:
+        raise InvalidCursorException() from e
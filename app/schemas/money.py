@@ -0,0 +1,50 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any
+
+from typing_extensions import Annotated
+
+from pydantic import AfterValidator, BeforeValidator, Field, PlainSerializer
+
+
+# Amounts and balances are stored and computed as integers of minor units (cents). The API shows them
+# as decimals with two places; schemas convert at the edge and nothing else handles Decimal.
+MINOR_UNIT = Decimal("0.01")
+
+# Keeps amounts, and sums of a few of them, within bigint.
+MAX_AMOUNT = Decimal("1e16")
+
+
+def to_minor_units(amount: Decimal) -> int:
+    return int(amount.quantize(MINOR_UNIT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_minor_units(minor_units: int) -> Decimal:
+    return Decimal(minor_units).scaleb(-2)
+
+
+def _check_positive(minor_units: int) -> int:
+    # Checked after rounding: "0.001" is positive as a decimal but 0 in minor units.
+    if minor_units <= 0:
+        raise ValueError(f"Input should be at least {MINOR_UNIT}")
+    return minor_units
+
+
+def _parse_minor_units(value: Any) -> Any:
+    # Our own data: ints from the database, or decimals as the API showed them (stored idempotent responses).
+    if isinstance(value, (str, Decimal)):
+        return to_minor_units(Decimal(value))
+    return value
+
+
+# Decimal in requests, minor units once validated.
+Amount = Annotated[Decimal, Field(lt=MAX_AMOUNT), AfterValidator(to_minor_units)]
+
+# Amount of an operation or a transfer: at least one minor unit.
+PositiveAmount = Annotated[Amount, AfterValidator(_check_positive)]
+
+# Minor units inside, decimal in responses.
+MinorUnits = Annotated[
+    int,
+    BeforeValidator(_parse_minor_units),
+    PlainSerializer(from_minor_units, return_type=Decimal),
+]
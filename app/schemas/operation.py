@@ -1,10 +1,13 @@
-from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime
+from typing import List, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from typing_extensions import TypedDict
+
+from pydantic import BaseModel, Field, TypeAdapter
 from uuid import UUID
 
 from app.models.enums import OperationType
+from app.schemas.money import MinorUnits, PositiveAmount
 
 
 class OperationBase(BaseModel):
@@ -13,12 +16,6 @@ class OperationBase(BaseModel):
         description=f"Type of operation: {OperationType}.",
         example="DEPOSIT",
     )
-    amount: Decimal = Field(
-        ...,
-        gt=0,
-        description=f"Positive decimal value of operation.",
-        example="100.00",
-    )
 
     model_config = {
         "from_attributes": True,
@@ -27,13 +24,20 @@ class OperationBase(BaseModel):
 
 
 class OperationCreate(OperationBase):
-    @classmethod
-    @field_validator("amount")
-    def _quantize_amount(cls, v: Decimal) -> Decimal:
-        return v.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    amount: PositiveAmount = Field(
+        ...,
+        description=f"Positive decimal value of operation.",
+        example="100.00",
+    )
 
 
 class OperationRead(OperationBase):
+    amount: MinorUnits = Field(
+        ...,
+        description=f"Positive decimal value of operation.",
+        example="100.00",
+    )
+
     id: UUID = Field(
         ...,
         description=f"Unique identifier of operation (autogenerated).",
@@ -52,3 +56,76 @@ class OperationRead(OperationBase):
         example="2025-09-26T17:37:15.123456+03:00",
     )
 
+    transfer_id: Optional[UUID] = Field(
+        None,
+        description=f"Identifier of transfer, if operation is one of its legs.",
+        example="5f0c6a4e-2b1d-4f7a-9c3e-8d2a1b0e6f47",
+    )
+
+
+class OperationRow(TypedDict):
+    # Same fields as OperationRead, serialized from DB rows without validation.
+    operation_type: OperationType
+    amount: MinorUnits
+    id: UUID
+    wallet_id: UUID
+    created_at: datetime
+    transfer_id: Optional[UUID]
+
+
+operation_rows_adapter = TypeAdapter(List[OperationRow])
+
+
+MAX_BATCH_SIZE = 10_000
+
+
+class OperationBatchItem(OperationCreate):
+    wallet_id: UUID = Field(
+        ...,
+        description=f"Unique identifier of wallet affected by this operation.",
+        example="3c2f2b83-6c8c-4f02-9e5d-1977fd68a271",
+    )
+
+
+class OperationBatchCreate(BaseModel):
+    operations: List[OperationBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+        description=f"Operations to apply, in order of application.",
+    )
+
+    atomic: bool = Field(
+        True,
+        description=f"Apply all operations or none of them. "
+                    f"If false, every operation that can be applied is applied and failures are reported per item.",
+    )
+
+
+class OperationBatchItemResult(BaseModel):
+    index: int = Field(
+        ...,
+        description=f"Position of operation in the request.",
+        example=0,
+    )
+
+    status_code: int = Field(
+        ...,
+        description=f"HTTP status code the operation would get from single operation endpoint.",
+        example=201,
+    )
+
+    operation: Optional[OperationRead] = Field(
+        None,
+        description=f"Created operation, if it was applied.",
+    )
+
+    detail: Optional[str] = Field(
+        None,
+        description=f"Reason of failure, if operation was not applied.",
+        example="Insufficient funds.",
+    )
+
+
+class OperationBatchRead(BaseModel):
+    results: List[OperationBatchItemResult]
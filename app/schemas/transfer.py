@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field, model_validator
+from uuid import UUID
+
+from app.schemas.money import MinorUnits, PositiveAmount
+from app.schemas.operation import OperationRead
+
+
+class TransferBase(BaseModel):
+    from_wallet_id: UUID = Field(
+        ...,
+        description=f"Unique identifier of wallet the amount is withdrawn from.",
+        example="9f13d9c0-7db0-4a46-bdf0-148f9a2a5d22",
+    )
+
+    to_wallet_id: UUID = Field(
+        ...,
+        description=f"Unique identifier of wallet the amount is deposited to.",
+        example="3c2f2b83-6c8c-4f02-9e5d-1977fd68a271",
+    )
+
+    model_config = {
+        "from_attributes": True,
+        "arbitrary_types_allowed": True,
+    }
+
+
+class TransferCreate(TransferBase):
+    amount: PositiveAmount = Field(
+        ...,
+        description=f"Positive decimal value of transfer.",
+        example="100.00",
+    )
+
+    @model_validator(mode="after")
+    def _check_wallets_differ(self) -> "TransferCreate":
+        if self.from_wallet_id == self.to_wallet_id:
+            raise ValueError("Transfer to the same wallet.")
+        return self
+
+
+class TransferRead(TransferBase):
+    amount: MinorUnits = Field(
+        ...,
+        description=f"Positive decimal value of transfer.",
+        example="100.00",
+    )
+
+    id: UUID = Field(
+        ...,
+        description=f"Unique identifier of transfer (autogenerated), shared by its operations.",
+        example="5f0c6a4e-2b1d-4f7a-9c3e-8d2a1b0e6f47",
+    )
+
+    created_at: datetime = Field(
+        ...,
+        description=f"Date and time of transfer (automatically set while DB record creating).",
+        example="2025-09-26T17:37:15.123456+03:00",
+    )
+
+    operations: List[OperationRead] = Field(
+        ...,
+        description=f"Operations of transfer: TRANSFER_OUT on the source wallet and TRANSFER_IN on the target one.",
+    )
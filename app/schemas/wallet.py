@@ -1,8 +1,12 @@
-from decimal import Decimal, ROUND_HALF_UP
 from uuid import UUID
 from datetime import datetime
+from typing import List
 
-from pydantic import BaseModel, Field, field_validator
+from typing_extensions import TypedDict
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.schemas.money import Amount, MinorUnits
 
 
 class WalletBase(BaseModel):
@@ -31,13 +35,25 @@ class WalletRead(WalletBase):
         example="2025-09-26T17:37:15.123456+03:00",
     )
 
-    balance: Decimal = Field(
+    balance: MinorUnits = Field(
         ...,
         description="Balance of wallet.",
         example="100.00"
     )
 
 
+class WalletRow(TypedDict):
+    # Same fields as WalletRead, serialized from DB rows without validation.
+    id: UUID
+    created_at: datetime
+    updated_at: datetime
+    balance: MinorUnits
+
+
+wallet_row_adapter = TypeAdapter(WalletRow)
+wallet_rows_adapter = TypeAdapter(List[WalletRow])
+
+
 class WalletCreate(WalletBase):
     id: UUID = Field(
         ...,
@@ -45,14 +61,45 @@ class WalletCreate(WalletBase):
         example="9f13d9c0-7db0-4a46-bdf0-148f9a2a5d22",
     )
 
-    balance: Decimal = Field(
+    balance: Amount = Field(
         ...,
+        ge=0,
         description="Balance of wallet.",
         example="100.00"
     )
 
-    @classmethod
-    @field_validator("amount")
-    def _quantize_amount(cls, v: Decimal) -> Decimal:
-        return v.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
+class WalletStripesUpdate(WalletBase):
+    stripe_count: int = Field(
+        ...,
+        ge=1,
+        le=256,
+        description="Number of rows the wallet's balance is spread over. "
+                    "Deposits go to a random stripe, so they don't wait for each other.",
+        example=16,
+    )
+
+
+class WalletImportDuplicate(WalletBase):
+    line: int = Field(..., description="Line of the uploaded file.", example=42)
+
+    id: UUID = Field(
+        ...,
+        description="Id of wallet that already existed or was repeated in the file.",
+        example="9f13d9c0-7db0-4a46-bdf0-148f9a2a5d22",
+    )
+
+
+class WalletImportRead(WalletBase):
+    imported: int = Field(..., description="Number of created wallets.", example=5000000)
+
+    duplicate_count: int = Field(
+        ...,
+        description="Number of rows that were skipped because their wallet id was already taken.",
+        example=2,
+    )
+
+    duplicates: List[WalletImportDuplicate] = Field(
+        ...,
+        description="The first skipped rows, up to WALLET_IMPORT_MAX_REPORTED_DUPLICATES of them.",
+    )
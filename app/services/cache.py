@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.models.wallet import WALLET_CHANGED_CHANNEL
+from app.schemas.wallet import WalletRead
+
+
+log = logging.getLogger("uvicorn.error")
+
+
+class WalletCache:
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = False
+        self._clock = clock
+        self._entries: OrderedDict[UUID, Tuple[float, WalletRead]] = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, wallet_id: UUID) -> Optional[WalletRead]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(wallet_id)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[wallet_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(wallet_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, wallet: WalletRead, version: int) -> None:
+        # A fill that raced with an invalidation may carry the old balance, so it is dropped.
+        if not self.enabled or version != self._version:
+            return
+        self._entries[wallet.id] = (self._clock() + self.ttl_seconds, wallet)
+        self._entries.move_to_end(wallet.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, wallet_id: UUID) -> None:
+        self._version += 1
+        self.invalidations += 1
+        self._entries.pop(wallet_id, None)
+
+    def clear(self) -> None:
+        self._version += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class WalletCacheInvalidator:
+    # Listens for wallet changes committed by other workers. While not listening the cache is disabled,
+    # since notifications sent in the meantime are lost.
+    def __init__(self, cache: WalletCache, database_url: str, reconnect_delay: float = 1.0):
+        self._cache = cache
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._reconnect_delay = reconnect_delay
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self) -> None:
+        while True:
+            closed = asyncio.Event()
+            try:
+                conn = await asyncpg.connect(self._dsn)
+            except (OSError, asyncpg.PostgresError):
+                log.warning("Wallet cache listener can't connect, retrying.", exc_info=True)
+                await asyncio.sleep(self._reconnect_delay)
+                continue
+            try:
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(WALLET_CHANGED_CHANNEL, self._on_notification)
+                self._cache.clear()
+                self._cache.enabled = True
+                await closed.wait()
+                log.warning("Wallet cache listener connection lost, reconnecting.")
+            finally:
+                self._cache.enabled = False
+                self._cache.clear()
+                if not conn.is_closed():
+                    await conn.close()
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            self._cache.invalidate(UUID(payload))
+        except ValueError:
+            self._cache.clear()
@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from uuid import UUID
+
+from app.models.enums import OperationType
+from app.tracing import batch_trace, current_trace_id, trace_phase
+
+
+@dataclass
+class PendingOperation:
+    amount: int
+    op_type: OperationType
+    idempotency_key: Optional[str] = None
+    trace_id: Optional[str] = field(default_factory=current_trace_id)
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+BatchApplier = Callable[[UUID, List[PendingOperation]], Awaitable[List[Any]]]
+
+
+class WalletOperationCombiner:
+    # Operations on a wallet that arrive while its transaction is running are queued and applied
+    # together in the next one. apply_batch returns, in arrival order, a result or an exception per item.
+    def __init__(self, max_batch_size: int):
+        self._max_batch_size = max_batch_size
+        self._queues: Dict[UUID, List[PendingOperation]] = {}
+        self._drainers: Set[asyncio.Task] = set()
+
+    async def submit(
+            self,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+            apply_batch: BatchApplier,
+            idempotency_key: Optional[str] = None,
+    ) -> Any:
+        pending = PendingOperation(amount=amount, op_type=op_type, idempotency_key=idempotency_key)
+        queue = self._queues.get(wallet_id)
+        if queue is None:
+            queue = self._queues[wallet_id] = []
+            # The drainer serves later callers too, so it mustn't inherit this request's context (its trace).
+            task = asyncio.create_task(self._drain(wallet_id, queue, apply_batch), context=contextvars.Context())
+            self._drainers.add(task)
+            task.add_done_callback(self._drainers.discard)
+        queue.append(pending)
+        with trace_phase("batch_wait"):
+            return await pending.future
+
+    async def _drain(self, wallet_id: UUID, queue: List[PendingOperation], apply_batch: BatchApplier) -> None:
+        try:
+            while queue:
+                batch = [p for p in queue[:self._max_batch_size] if not p.future.done()]
+                del queue[:self._max_batch_size]
+                if not batch:
+                    continue
+                try:
+                    with batch_trace("combiner", (p.trace_id for p in batch)):
+                        results = await apply_batch(wallet_id, batch)
+                except Exception as e:
+                    results = [e] * len(batch)
+                except BaseException:
+                    # Cancelled, e.g. at shutdown: the batch's callers must not wait forever.
+                    for pending in batch:
+                        if not pending.future.done():
+                            pending.future.cancel()
+                    raise
+                for pending, result in zip(batch, results):
+                    if pending.future.done():
+                        continue
+                    if isinstance(result, BaseException):
+                        pending.future.set_exception(result)
+                    else:
+                        pending.future.set_result(result)
+        finally:
+            del self._queues[wallet_id]
+            for pending in queue:
+                if not pending.future.done():
+                    pending.future.cancel()
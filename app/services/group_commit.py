@@ -0,0 +1,81 @@
+import asyncio
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Set
+from uuid import UUID
+
+from app.models.enums import OperationType
+from app.tracing import batch_trace, current_trace_id, trace_phase
+
+
+@dataclass
+class GroupedOperation:
+    wallet_id: UUID
+    amount: int
+    op_type: OperationType
+    trace_id: Optional[str] = field(default_factory=current_trace_id)
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+GroupApplier = Callable[[List[GroupedOperation]], Awaitable[List[Any]]]
+
+
+class GroupCommitScheduler:
+    # Operations on any wallets that arrive within window_seconds, up to max_size of them, are applied
+    # in one transaction and share its commit. apply_group returns, in arrival order, a result or an exception per item.
+    def __init__(self, window_seconds: float, max_size: int):
+        self._window_seconds = window_seconds
+        self._max_size = max_size
+        self._pending: List[GroupedOperation] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._groups: Set[asyncio.Task] = set()
+
+    async def submit(
+            self,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+            apply_group: GroupApplier,
+    ) -> Any:
+        grouped = GroupedOperation(wallet_id=wallet_id, amount=amount, op_type=op_type)
+        self._pending.append(grouped)
+        if len(self._pending) >= self._max_size:
+            self._flush(apply_group)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window_seconds, self._flush, apply_group)
+        with trace_phase("batch_wait"):
+            return await grouped.future
+
+    def _flush(self, apply_group: GroupApplier) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        group, self._pending = self._pending, []
+        # Runs in the context of whichever caller filled the group or started its timer; its trace isn't the group's.
+        task = asyncio.create_task(self._apply(group, apply_group), context=contextvars.Context())
+        self._groups.add(task)
+        task.add_done_callback(self._groups.discard)
+
+    @staticmethod
+    async def _apply(group: List[GroupedOperation], apply_group: GroupApplier) -> None:
+        group = [g for g in group if not g.future.done()]
+        if not group:
+            return
+        try:
+            with batch_trace("group_commit", (g.trace_id for g in group)):
+                results = await apply_group(group)
+        except Exception as e:
+            results = [e] * len(group)
+        except BaseException:
+            # Cancelled, e.g. at shutdown: the group's callers must not wait forever.
+            for grouped in group:
+                if not grouped.future.done():
+                    grouped.future.cancel()
+            raise
+        for grouped, result in zip(group, results):
+            if grouped.future.done():
+                continue
+            if isinstance(result, BaseException):
+                grouped.future.set_exception(result)
+            else:
+                grouped.future.set_result(result)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
+from uuid import UUID
+
+from app.config import settings
+from app.db.base import DBConnectionManager
+from app.metrics import RECONCILIATION_DRIFTED_WALLETS, RECONCILIATION_DURATION
+import app.crud.checkpoint as crud_checkpoint
+from app.schemas.money import from_minor_units
+
+
+log = logging.getLogger("uvicorn.error")
+
+# Key of the advisory lock letting a single reconciliation run at a time across workers and the CLI.
+RECONCILIATION_LOCK_KEY = 7_340_016
+
+
+@dataclass
+class WalletDrift:
+    wallet_id: UUID
+    balance: int
+    expected_balance: int
+
+
+@dataclass
+class ReconciliationReport:
+    horizon: Optional[datetime] = None
+    checked_wallets: int = 0
+    advanced_checkpoints: int = 0
+    drifted: List[WalletDrift] = field(default_factory=list)
+
+
+class Reconciler:
+    # Checks that the balance of every wallet equals its checkpoint plus the operations added after it,
+    # then moves the checkpoint over those operations. Wallets without a checkpoint are checked from zero.
+    def __init__(self, db_connection_manager: DBConnectionManager, batch_size: int, concurrency: int):
+        self.db_connection_manager = db_connection_manager
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def run(self) -> Optional[ReconciliationReport]:
+        # Returns None when another reconciliation holds the lock.
+        async with self.db_connection_manager.get_raw_connection() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", RECONCILIATION_LOCK_KEY):
+                return None
+            try:
+                with RECONCILIATION_DURATION.time():
+                    report = await self._reconcile_all()
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", RECONCILIATION_LOCK_KEY)
+        RECONCILIATION_DRIFTED_WALLETS.set(len(report.drifted))
+        for drift in report.drifted:
+            log.error(
+                "Wallet %s balance %s drifted from ledger balance %s.",
+                drift.wallet_id, from_minor_units(drift.balance), from_minor_units(drift.expected_balance),
+            )
+        return report
+
+    async def _reconcile_all(self) -> ReconciliationReport:
+        # Read before the batches take their snapshots: operations older than the horizon are all committed
+        # and visible to them, so checkpoints never skip an operation committed later with an earlier created_at.
+        async with await self.db_connection_manager.get_session() as session:
+            horizon = await crud_checkpoint.read_safe_horizon(session)
+        report = ReconciliationReport(horizon=horizon)
+        slots = asyncio.Semaphore(self.concurrency)
+        after: Optional[UUID] = None
+        async with asyncio.TaskGroup() as tg:
+            while True:
+                await slots.acquire()
+                async with await self.db_connection_manager.get_session() as session:
+                    wallet_ids = await crud_checkpoint.list_wallet_ids(session, after, self.batch_size)
+                if not wallet_ids:
+                    slots.release()
+                    break
+                after = wallet_ids[-1]
+                tg.create_task(self._reconcile_batch(wallet_ids, horizon, report, slots))
+        report.drifted.sort(key=lambda d: d.wallet_id)
+        return report
+
+    async def _reconcile_batch(
+            self,
+            wallet_ids: List[UUID],
+            horizon: datetime,
+            report: ReconciliationReport,
+            slots: asyncio.Semaphore,
+    ) -> None:
+        try:
+            async with await self.db_connection_manager.get_session() as session:
+                async with session.begin():
+                    rows = await crud_checkpoint.read_unverified_totals(session, wallet_ids, horizon)
+                    checkpoints = []
+                    for row in rows:
+                        expected = row["checkpoint_balance"] + row["delta"]
+                        if expected != row["total_balance"]:
+                            report.drifted.append(WalletDrift(row["wallet_id"], row["total_balance"], expected))
+                        elif row["last_safe_id"] is not None:
+                            checkpoints.append({
+                                "wallet_id": row["wallet_id"],
+                                "balance": row["checkpoint_balance"] + row["safe_delta"],
+                                "last_operation_created_at": row["last_safe_created_at"],
+                                "last_operation_id": row["last_safe_id"],
+                            })
+                    await crud_checkpoint.save_checkpoints(session, checkpoints)
+            report.checked_wallets += len(rows)
+            report.advanced_checkpoints += len(checkpoints)
+        finally:
+            slots.release()
+
+
+class ReconciliationScheduler:
+    def __init__(self, reconciler: Reconciler, interval_seconds: float):
+        self._reconciler = reconciler
+        self._interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval_seconds)
+            try:
+                report = await self._reconciler.run()
+            except Exception:
+                log.exception("Reconciliation failed.")
+                continue
+            if report is not None:
+                log.info(
+                    "Reconciled %s wallets, %s checkpoints advanced, %s drifted.",
+                    report.checked_wallets, report.advanced_checkpoints, len(report.drifted),
+                )
+
+
+@lru_cache
+def get_reconciliation_scheduler() -> ReconciliationScheduler:
+    reconciler = Reconciler(
+        DBConnectionManager,
+        batch_size=settings.RECONCILIATION_BATCH_SIZE,
+        concurrency=settings.RECONCILIATION_CONCURRENCY,
+    )
+    return ReconciliationScheduler(reconciler, settings.RECONCILIATION_INTERVAL_SECONDS)
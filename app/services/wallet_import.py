@@ -0,0 +1,96 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Tuple
+from uuid import UUID
+
+from app.schemas.money import MAX_AMOUNT, to_minor_units
+
+
+CSV_MEDIA_TYPE = "text/csv"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class WalletImportFormatException(Exception):
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    # Splits the uploaded stream into numbered lines, holding no more than one chunk and one line in memory.
+    line_no = 0
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            line_no += 1
+            yield line_no, _decode(line_no, line)
+    if tail:
+        yield line_no + 1, _decode(line_no + 1, tail)
+
+
+def _decode(line_no: int, line: bytes) -> str:
+    try:
+        return line.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise WalletImportFormatException(line_no, "not valid UTF-8")
+
+
+def parse_csv_line(line_no: int, line: str) -> Tuple[Any, Any]:
+    fields = next(csv.reader([line]))
+    if len(fields) != 2:
+        raise WalletImportFormatException(line_no, "expected 2 fields: id,balance")
+    return fields[0], fields[1]
+
+
+def parse_ndjson_line(line_no: int, line: str) -> Tuple[Any, Any]:
+    try:
+        item = json.loads(line, parse_float=Decimal)
+    except ValueError:
+        raise WalletImportFormatException(line_no, "not valid JSON")
+    if not isinstance(item, dict) or "id" not in item or "balance" not in item:
+        raise WalletImportFormatException(line_no, 'expected object {"id": ..., "balance": ...}')
+    return item["id"], item["balance"]
+
+
+LINE_PARSERS: Dict[str, Callable[[int, str], Tuple[Any, Any]]] = {
+    CSV_MEDIA_TYPE: parse_csv_line,
+    NDJSON_MEDIA_TYPE: parse_ndjson_line,
+}
+
+
+async def parse_wallet_rows(
+        chunks: AsyncIterable[bytes],
+        media_type: str,
+) -> AsyncIterator[Tuple[int, UUID, int]]:
+    # Yields (line, id, balance in minor units) of every wallet; blank lines and a CSV header are skipped.
+    parse_line = LINE_PARSERS[media_type]
+    async for line_no, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        raw_id, raw_balance = parse_line(line_no, line)
+        if line_no == 1 and media_type == CSV_MEDIA_TYPE and raw_id.strip().lower() == "id":
+            continue
+        yield line_no, _wallet_id(line_no, raw_id), _balance(line_no, raw_balance)
+
+
+def _wallet_id(line_no: int, value: Any) -> UUID:
+    try:
+        return UUID(str(value).strip())
+    except ValueError:
+        raise WalletImportFormatException(line_no, f"invalid wallet id {value!r}")
+
+
+def _balance(line_no: int, value: Any) -> int:
+    if isinstance(value, bool):
+        raise WalletImportFormatException(line_no, f"invalid balance {value!r}")
+    try:
+        balance = Decimal(str(value).strip())
+        if not 0 <= balance < MAX_AMOUNT:
+            raise WalletImportFormatException(line_no, f"balance {value} is out of range")
+        return to_minor_units(balance)
+    except (InvalidOperation, ValueError):
+        raise WalletImportFormatException(line_no, f"invalid balance {value!r}")
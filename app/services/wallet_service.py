@@ -1,79 +1,597 @@
-from uuid import UUID
-from decimal import Decimal
-from typing import List
+import asyncio
+import random
+from uuid import UUID, uuid4
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
+from asyncpg import Connection, Record
 from fastapi import Depends
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.db.base import DBConnectionManager
+from app.metrics import (
+    OPERATION_TRANSACTION_DURATION,
+    WALLET_LOCK_WAIT,
+    WALLET_OPTIMISTIC_FALLBACKS,
+    WALLET_VERSION_CONFLICTS,
+)
 from app.models.enums import OperationType
+from app.models.idempotency import IdempotencyKey
 from app.models.operation import Operation
 from app.models.wallet import Wallet
 import app.crud.wallet as crud_wallet
 import app.crud.operation as crud_op
+import app.crud.idempotency as crud_idempotency
+import app.crud.wallet_stripe as crud_stripe
+import app.crud.raw as crud_raw
+import app.crud.checkpoint as crud_checkpoint
+import app.crud.wallet_import as crud_wallet_import
+import app.crud.operation_export as crud_export
+from app.schemas.operation import OperationRead
+from app.schemas.transfer import TransferRead
+from app.schemas.wallet import WalletImportDuplicate, WalletImportRead, WalletRead
+from app.services.cache import WalletCache, WalletCacheInvalidator
+from app.services.combiner import PendingOperation, WalletOperationCombiner
+from app.services.group_commit import GroupCommitScheduler, GroupedOperation
+from app.tracing import trace_phase, traced
 
 
 class WalletService:
     def __init__(self, db_connection_manager: DBConnectionManager):
         self.db_connection_manager = db_connection_manager
 
+    @traced
     async def apply_operation(
             self,
             wallet_id: UUID,
-            amount: Decimal,
+            amount: int,
             op_type: OperationType,
-    ) -> Operation:
+            idempotency_key: Optional[str] = None,
+    ) -> OperationRead:
+        if idempotency_key is None:
+            return await self._apply_operation(wallet_id, amount, op_type)
         async with await self.db_connection_manager.get_session() as session:
-            async with session.begin():
-                wallet = await crud_wallet.get_wallet_for_update(session, wallet_id)
-                if wallet is None:
-                    raise UnrecognizedWalletId()
-                if op_type is OperationType.WITHDRAW:
-                    if wallet.balance - amount < 0:
-                        raise InsufficientFundsException()
-                    wallet.balance -= amount
-                elif op_type is OperationType.DEPOSIT:
-                    wallet.balance += amount
-                else:
-                    raise UnsupportedOperationException
-                operation = await crud_op.create_operation(session, wallet.id, op_type, abs(amount))
-                await session.flush()
+            stored = await crud_idempotency.read_idempotency_key(session, idempotency_key)
+        if stored is not None:
+            return self._replay_idempotent_result(stored, wallet_id, amount, op_type)
+        in_flight = in_flight_idempotent_operations.get(idempotency_key)
+        if in_flight is not None:
+            request, result = in_flight
+            if request != (wallet_id, op_type, amount):
+                raise IdempotencyKeyReusedException()
+            return await asyncio.shield(result)
+        result = asyncio.get_running_loop().create_future()
+        in_flight_idempotent_operations[idempotency_key] = ((wallet_id, op_type, amount), result)
+        try:
+            operation = await self._apply_operation(wallet_id, amount, op_type, idempotency_key)
+        except Exception as e:
+            result.set_exception(e)
+            result.exception()
+            raise
+        else:
+            result.set_result(operation)
+            return operation
+        finally:
+            del in_flight_idempotent_operations[idempotency_key]
+            if not result.done():
+                result.cancel()
+
+    async def _apply_operation(
+            self,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+            idempotency_key: Optional[str] = None,
+    ) -> OperationRead:
+        if settings.REPOSITORY_BACKEND == "asyncpg" and idempotency_key is None:
+            operation = await self._apply_operation_raw(wallet_id, amount, op_type)
+            if operation is not None:
                 return operation
+        if settings.GROUP_COMMIT_ENABLED and idempotency_key is None:
+            result = await get_group_commit_scheduler().submit(
+                wallet_id, amount, op_type, self._apply_operations_group
+            )
+        elif settings.OPERATION_COMBINER_ENABLED and settings.APPLY_OPERATION_MODE != "single_statement":
+            # Not in single_statement mode: a batch would hold the row lock until its last operation.
+            result = await get_operation_combiner().submit(
+                wallet_id, amount, op_type, self._apply_operations_batch, idempotency_key
+            )
+        else:
+            pending = PendingOperation(amount=amount, op_type=op_type, idempotency_key=idempotency_key)
+            [result] = await self._apply_operations_batch(wallet_id, [pending])
+            if isinstance(result, Exception):
+                raise result
+        return OperationRead.model_validate(result)
 
-    async def get_all_operations_by_wallet_id(self, wallet_id: UUID) -> List[Operation]:
-        async with await self.db_connection_manager.get_session() as session:
-            async with session.begin():
-                wallet = await crud_wallet.get_wallet_for_update(session, wallet_id)
-                if wallet is None:
+    async def _apply_operation_raw(
+            self,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+    ) -> Optional[OperationRead]:
+        # One statement in autocommit; returns None when the operation must take the ORM path (striped wallets).
+        if op_type not in crud_raw.APPLY_OPERATION_SQL:
+            return None
+        operation_id = uuid4()
+
+        async def apply(conn: Connection) -> Record:
+            with OPERATION_TRANSACTION_DURATION.time():
+                return await crud_raw.apply_operation(conn, operation_id, wallet_id, op_type, amount)
+
+        row = await self.db_connection_manager.run_raw(apply)
+        if row["stripe_count"] is None:
+            raise UnrecognizedWalletId()
+        if row["created_at"] is None:
+            if row["stripe_count"] > 0:
+                return None
+            raise InsufficientFundsException()
+        get_wallet_cache().invalidate(wallet_id)
+        return OperationRead.model_construct(
+            id=operation_id,
+            wallet_id=wallet_id,
+            operation_type=op_type,
+            amount=amount,
+            created_at=row["created_at"],
+        )
+
+    async def _apply_operations_batch(self, wallet_id: UUID, batch: List[PendingOperation]) -> List[Any]:
+        async def apply_batch(session: AsyncSession) -> List[Any]:
+            with OPERATION_TRANSACTION_DURATION.time():
+                self._plan_stripe_deposits(session, ((wallet_id, pending.op_type) for pending in batch))
+                replayed = await self._claim_idempotency_keys(session, wallet_id, batch)
+                apply = await self._operation_applier(session, wallet_id)
+                results: List[Any] = []
+                for pending in batch:
+                    if pending.idempotency_key in replayed:
+                        results.append(replayed[pending.idempotency_key])
+                        continue
+                    try:
+                        operation = await apply(pending.amount, pending.op_type)
+                    except (InsufficientFundsException, UnsupportedOperationException) as e:
+                        results.append(e)
+                    else:
+                        results.append(operation)
+                await session.flush()
+                for pending, result in zip(batch, results):
+                    if pending.idempotency_key is not None and pending.idempotency_key not in replayed:
+                        await self._store_idempotent_result(session, pending.idempotency_key, result)
+                return results
+
+        results = await self.db_connection_manager.run_transaction(apply_batch)
+        get_wallet_cache().invalidate(wallet_id)
+        return results
+
+    async def _apply_operations_group(self, group: List[GroupedOperation]) -> List[Any]:
+        # Wallets are locked up front in id order, then every operation runs in its own savepoint,
+        # so a failed one is rolled back alone and the rest commit together.
+        wallet_ids = {grouped.wallet_id for grouped in group}
+
+        async def apply_group(session: AsyncSession) -> List[Any]:
+            with OPERATION_TRANSACTION_DURATION.time():
+                with WALLET_LOCK_WAIT.time(), trace_phase("lock_wait"):
+                    await crud_wallet.get_wallets_for_update(session, wallet_ids)
+                self._plan_stripe_deposits(session, ((grouped.wallet_id, grouped.op_type) for grouped in group))
+                results: List[Any] = []
+                for grouped in group:
+                    try:
+                        async with session.begin_nested():
+                            operation = await self._apply_conditionally(
+                                session, grouped.wallet_id, grouped.amount, grouped.op_type
+                            )
+                    # Database errors fail the whole group, so retryable ones rerun it in a new transaction.
+                    except (UnrecognizedWalletId, InsufficientFundsException, UnsupportedOperationException) as e:
+                        results.append(e)
+                    else:
+                        results.append(operation)
+                return results
+
+        results = await self.db_connection_manager.run_transaction(apply_group)
+        for wallet_id in wallet_ids:
+            get_wallet_cache().invalidate(wallet_id)
+        return results
+
+    async def _claim_idempotency_keys(
+            self,
+            session: AsyncSession,
+            wallet_id: UUID,
+            batch: List[PendingOperation],
+    ) -> Dict[str, Any]:
+        # Keys are claimed before the wallet is locked and in sorted order,
+        # so transactions waiting on each other's keys can't deadlock.
+        replayed: Dict[str, Any] = {}
+        pending_by_key = {p.idempotency_key: p for p in batch if p.idempotency_key is not None}
+        for key in sorted(pending_by_key):
+            pending = pending_by_key[key]
+            try:
+                claimed = await crud_idempotency.claim_idempotency_key(
+                    session, key, wallet_id, pending.op_type, pending.amount
+                )
+            except IntegrityError as e:
+                # foreign_key_violation: the key references a wallet that doesn't exist.
+                if getattr(e.orig, "sqlstate", None) == "23503":
                     raise UnrecognizedWalletId()
-                ops = await crud_op.list_operations_by_wallet(session, wallet_id, 10)
-                return ops
+                raise
+            if claimed:
+                continue
+            stored = await crud_idempotency.read_idempotency_key(session, key)
+            try:
+                replayed[key] = self._replay_idempotent_result(stored, wallet_id, pending.amount, pending.op_type)
+            except (IdempotencyKeyReusedException, InsufficientFundsException, UnsupportedOperationException) as e:
+                replayed[key] = e
+        return replayed
 
-    async def get_wallet(
+    @staticmethod
+    async def _store_idempotent_result(session: AsyncSession, key: str, result: Any) -> None:
+        if isinstance(result, Exception):
+            error = next(code for code, exc_type in IDEMPOTENT_ERRORS.items() if isinstance(result, exc_type))
+            await crud_idempotency.store_idempotency_result(session, key, error=error)
+        else:
+            response = OperationRead.model_validate(result).model_dump(mode="json")
+            await crud_idempotency.store_idempotency_result(session, key, response=response)
+
+    @staticmethod
+    def _replay_idempotent_result(
+            stored: IdempotencyKey,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+    ) -> OperationRead:
+        if not stored.matches(wallet_id, op_type, amount):
+            raise IdempotencyKeyReusedException()
+        if stored.error is not None:
+            raise IDEMPOTENT_ERRORS[stored.error]()
+        return OperationRead.model_validate(stored.response)
+
+    async def _operation_applier(
             self,
+            session: AsyncSession,
             wallet_id: UUID,
-    ) -> Wallet:
-        async with await self.db_connection_manager.get_session() as session:
-            async with session.begin():
-                wallet = await crud_wallet.read_wallet(session, wallet_id)
-                if wallet is None:
-                    raise UnrecognizedWalletId
-                return wallet
+    ) -> Callable[[int, OperationType], Awaitable[Operation]]:
+        if settings.APPLY_OPERATION_MODE == "single_statement":
+            return partial(self._apply_conditionally, session, wallet_id)
+        if settings.APPLY_OPERATION_MODE == "optimistic":
+            return partial(self._apply_optimistically, session, wallet_id)
+        return await self._locking_applier(session, wallet_id)
 
-    async def get_all_wallets(self) -> List[Wallet]:
-        async with await self.db_connection_manager.get_session() as session:
-            async with session.begin():
-                res = await crud_wallet.read_all_wallets(session)
-                return res if res else []
+    async def _locking_applier(
+            self,
+            session: AsyncSession,
+            wallet_id: UUID,
+    ) -> Callable[[int, OperationType], Awaitable[Operation]]:
+        with WALLET_LOCK_WAIT.time(), trace_phase("lock_wait"):
+            wallet = await crud_wallet.get_unstriped_wallet_for_update(session, wallet_id)
+        if wallet is None:
+            wallet = await crud_wallet.read_wallet(session, wallet_id)
+            if wallet is None:
+                raise UnrecognizedWalletId()
+            return partial(self._apply_to_striped_wallet, session, wallet)
+        return partial(self._apply_to_locked_wallet, session, wallet)
 
-    async def create_wallet_by_id(self, wallet_id: UUID, initial_balance: Decimal) -> Wallet:
-        async with await self.db_connection_manager.get_session() as session:
-            async with session.begin():
+    @traced
+    async def apply_operations_batch(
+            self,
+            items: List[Tuple[UUID, int, OperationType]],
+            atomic: bool,
+    ) -> List[Any]:
+        async def apply_batch(session: AsyncSession) -> Tuple[List[UUID], List[Any]]:
+            locked = await crud_wallet.get_wallets_for_update(session, (wallet_id for wallet_id, _, _ in items))
+            wallets = {wallet.id: wallet for wallet in locked}
+            self._plan_stripe_deposits(session, ((wallet_id, op_type) for wallet_id, _, op_type in items))
+            results: List[Any] = []
+            rows = []
+            for index, (wallet_id, amount, op_type) in enumerate(items):
                 try:
-                    wallet = await crud_wallet.create_wallet_by_id(session, wallet_id, initial_balance)
-                except IntegrityError:
-                    raise WalletAlreadyExistException()
-                return wallet
+                    wallet = wallets.get(wallet_id)
+                    if wallet is None:
+                        raise UnrecognizedWalletId()
+                    if wallet.stripe_count:
+                        await self._change_striped_balance(session, wallet, amount, op_type)
+                    else:
+                        self._change_balance(wallet, amount, op_type)
+                except (UnrecognizedWalletId, InsufficientFundsException, UnsupportedOperationException) as e:
+                    if atomic:
+                        raise BatchOperationException(index, e)
+                    results.append(e)
+                else:
+                    results.append(None)
+                    rows.append({"wallet_id": wallet_id, "operation_type": op_type, "amount": abs(amount)})
+            operations = iter(await crud_op.create_operations(session, rows))
+            return list(wallets), [next(operations) if result is None else result for result in results]
+
+        wallet_ids, results = await self.db_connection_manager.run_transaction(apply_batch)
+        for wallet_id in wallet_ids:
+            get_wallet_cache().invalidate(wallet_id)
+        return results
+
+    @traced
+    async def transfer(self, from_wallet_id: UUID, to_wallet_id: UUID, amount: int) -> TransferRead:
+        # Both wallets are locked by one statement in id order, so opposite transfers can't deadlock.
+        transfer_id = uuid4()
+
+        async def apply_transfer(session: AsyncSession) -> List[Operation]:
+            with OPERATION_TRANSACTION_DURATION.time():
+                with WALLET_LOCK_WAIT.time(), trace_phase("lock_wait"):
+                    locked = await crud_wallet.get_wallets_for_update(session, (from_wallet_id, to_wallet_id))
+                wallets = {wallet.id: wallet for wallet in locked}
+                rows = []
+                for wallet_id, op_type, leg_type in (
+                        (from_wallet_id, OperationType.WITHDRAW, OperationType.TRANSFER_OUT),
+                        (to_wallet_id, OperationType.DEPOSIT, OperationType.TRANSFER_IN),
+                ):
+                    wallet = wallets.get(wallet_id)
+                    if wallet is None:
+                        raise UnrecognizedWalletId(wallet_id)
+                    if wallet.stripe_count:
+                        await self._change_striped_balance(session, wallet, amount, op_type)
+                    else:
+                        self._change_balance(wallet, amount, op_type)
+                    rows.append({
+                        "wallet_id": wallet_id,
+                        "operation_type": leg_type,
+                        "amount": amount,
+                        "transfer_id": transfer_id,
+                    })
+                return await crud_op.create_operations(session, rows)
+
+        operations = await self.db_connection_manager.run_transaction(apply_transfer)
+        get_wallet_cache().invalidate(from_wallet_id)
+        get_wallet_cache().invalidate(to_wallet_id)
+        return TransferRead(
+            id=transfer_id,
+            from_wallet_id=from_wallet_id,
+            to_wallet_id=to_wallet_id,
+            amount=amount,
+            created_at=operations[0].created_at,
+            operations=[OperationRead.model_validate(operation) for operation in operations],
+        )
+
+    @classmethod
+    async def _apply_to_locked_wallet(
+            cls,
+            session: AsyncSession,
+            wallet: Wallet,
+            amount: int,
+            op_type: OperationType,
+    ) -> Operation:
+        cls._change_balance(wallet, amount, op_type)
+        return await crud_op.create_operation(session, wallet.id, op_type, abs(amount))
+
+    @classmethod
+    def _change_balance(cls, wallet: Wallet, amount: int, op_type: OperationType) -> None:
+        wallet.balance = cls._new_balance(wallet.balance, amount, op_type)
+
+    @staticmethod
+    def _new_balance(balance: int, amount: int, op_type: OperationType) -> int:
+        if op_type is OperationType.WITHDRAW:
+            if balance - amount < 0:
+                raise InsufficientFundsException()
+            return balance - amount
+        if op_type is OperationType.DEPOSIT:
+            return balance + amount
+        raise UnsupportedOperationException()
+
+    async def _apply_optimistically(
+            self,
+            session: AsyncSession,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+    ) -> Operation:
+        # Reads the wallet without locking it and writes the new balance only if its version is unchanged.
+        # After OPTIMISTIC_MAX_CONFLICTS lost races the wallet is contended, so it is locked instead.
+        for _ in range(settings.OPTIMISTIC_MAX_CONFLICTS):
+            row = await crud_wallet.read_wallet_version(session, wallet_id)
+            if row is None:
+                raise UnrecognizedWalletId()
+            if row.stripe_count:
+                break
+            new_balance = self._new_balance(row.balance, amount, op_type)
+            if await crud_wallet.update_balance_if_version(session, wallet_id, row.version, new_balance):
+                return await crud_op.create_operation(session, wallet_id, op_type, abs(amount))
+            WALLET_VERSION_CONFLICTS.inc()
+        else:
+            WALLET_OPTIMISTIC_FALLBACKS.inc()
+        apply = await self._locking_applier(session, wallet_id)
+        return await apply(amount, op_type)
+
+    @classmethod
+    async def _apply_to_striped_wallet(
+            cls,
+            session: AsyncSession,
+            wallet: Wallet,
+            amount: int,
+            op_type: OperationType,
+    ) -> Operation:
+        await cls._change_striped_balance(session, wallet, amount, op_type)
+        return await crud_op.create_operation(session, wallet.id, op_type, abs(amount))
+
+    @classmethod
+    async def _change_striped_balance(
+            cls,
+            session: AsyncSession,
+            wallet: Wallet,
+            amount: int,
+            op_type: OperationType,
+    ) -> None:
+        if op_type is OperationType.WITHDRAW:
+            if not await crud_stripe.withdraw_from_stripes(session, wallet.id, wallet.stripe_count, amount):
+                raise InsufficientFundsException()
+        elif op_type is OperationType.DEPOSIT:
+            await crud_stripe.deposit_to_stripe(session, wallet.id, cls._deposit_stripe(session, wallet), amount)
+        else:
+            raise UnsupportedOperationException()
+
+    @staticmethod
+    def _plan_stripe_deposits(session: AsyncSession, ops: Iterable[Tuple[UUID, OperationType]]) -> None:
+        # Called before a transaction applies several operations, so deposits can pick stripes that keep its locks
+        # in stripe_no order: see _deposit_stripe().
+        session.info[WITHDRAWING_WALLETS] = {
+            wallet_id for wallet_id, op_type in ops if op_type is OperationType.WITHDRAW
+        }
+
+    @staticmethod
+    def _deposit_stripe(session: AsyncSession, wallet: Wallet) -> int:
+        # A transaction deposits to one stripe of a wallet. If it also withdraws from the wallet that is stripe 0,
+        # which withdrawals lock first, so two transactions can't lock the same stripes in opposite orders.
+        stripes = session.info.setdefault(DEPOSIT_STRIPES, {})
+        if wallet.id not in stripes:
+            withdrawing = wallet.id in session.info.get(WITHDRAWING_WALLETS, ())
+            stripes[wallet.id] = 0 if withdrawing else random.randrange(wallet.stripe_count)
+        return stripes[wallet.id]
+
+    @classmethod
+    async def _apply_conditionally(
+            cls,
+            session: AsyncSession,
+            wallet_id: UUID,
+            amount: int,
+            op_type: OperationType,
+    ) -> Operation:
+        if op_type not in (OperationType.WITHDRAW, OperationType.DEPOSIT):
+            raise UnsupportedOperationException()
+        operation, stripe_count = await crud_op.apply_operation_conditionally(session, wallet_id, op_type, abs(amount))
+        if stripe_count is None:
+            raise UnrecognizedWalletId()
+        if operation is not None:
+            return operation
+        # The statement's snapshot may predate striping of the wallet, so it is re-read before giving up.
+        wallet = await crud_wallet.read_wallet(session, wallet_id)
+        if wallet.stripe_count:
+            return await cls._apply_to_striped_wallet(session, wallet, amount, op_type)
+        raise InsufficientFundsException()
+
+    @traced
+    async def enable_striping(self, wallet_id: UUID, stripe_count: int) -> WalletRead:
+        async def stripe(session: AsyncSession) -> WalletRead:
+            wallet = await crud_wallet.get_wallet_for_update(session, wallet_id)
+            if wallet is None:
+                raise UnrecognizedWalletId()
+            if stripe_count < wallet.stripe_count:
+                raise StripeCountDecreaseException()
+            await crud_stripe.create_stripes(session, wallet_id, wallet.stripe_count, stripe_count)
+            if wallet.balance:
+                await crud_stripe.deposit_to_stripe(session, wallet_id, 0, wallet.balance)
+                wallet.balance = 0
+            wallet.stripe_count = stripe_count
+            await session.flush()
+            wallet, total_balance = await crud_wallet.read_wallet_with_balance(session, wallet_id)
+            return self._wallet_read(wallet, total_balance)
+
+        wallet_read = await self.db_connection_manager.run_transaction(stripe)
+        get_wallet_cache().invalidate(wallet_id)
+        return wallet_read
+
+    @staticmethod
+    def _wallet_read(wallet: Wallet, total_balance: int) -> WalletRead:
+        return WalletRead.model_validate(wallet).model_copy(update={"balance": total_balance})
+
+    @traced
+    async def get_all_operations_by_wallet_id(
+            self,
+            wallet_id: UUID,
+            limit: int = 10,
+            after: Optional[Tuple[datetime, UUID]] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        async with await self.db_connection_manager.get_read_session() as session:
+            wallet = await crud_wallet.read_wallet(session, wallet_id)
+            if wallet is None:
+                raise UnrecognizedWalletId()
+            ops = await crud_op.list_operations_by_wallet(session, wallet_id, limit + 1, after, since, until)
+            return ops[:limit], len(ops) > limit
+
+    async def export_operations(
+            self,
+            ndjson: bool,
+            wallet_id: Optional[UUID] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> AsyncIterator[bytes]:
+        # COPY writes into a short queue while the caller reads from it, so memory use doesn't grow with the export.
+        chunks: asyncio.Queue[bytes] = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+
+        async def copy() -> None:
+            async with self.db_connection_manager.get_raw_connection(read_only=True) as conn:
+                await crud_export.copy_operations(conn, chunks.put, ndjson, wallet_id, since, until)
+
+        copying = asyncio.create_task(copy())
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(chunks.get())
+                await asyncio.wait({next_chunk, copying}, return_when=asyncio.FIRST_COMPLETED)
+                if next_chunk.done():
+                    yield next_chunk.result()
+                    continue
+                next_chunk.cancel()
+                while not chunks.empty():
+                    yield chunks.get_nowait()
+                copying.result()
+                return
+        finally:
+            copying.cancel()
+
+    @traced
+    async def get_wallet(
+            self,
+            wallet_id: UUID,
+    ) -> WalletRead:
+        cached = get_wallet_cache().get(wallet_id)
+        if cached is not None:
+            return cached
+        cache_version = get_wallet_cache().version
+        if settings.REPOSITORY_BACKEND == "asyncpg":
+            async with self.db_connection_manager.get_raw_connection(read_only=True) as conn:
+                row = await crud_raw.read_wallet_with_balance(conn, wallet_id)
+            if row is None:
+                raise UnrecognizedWalletId
+            wallet_read = WalletRead.model_construct(**row)
+            get_wallet_cache().put(wallet_read, cache_version)
+            return wallet_read
+        async with await self.db_connection_manager.get_read_session() as session:
+            row = await crud_wallet.read_wallet_with_balance(session, wallet_id)
+            if row is None:
+                raise UnrecognizedWalletId
+            wallet_read = self._wallet_read(*row)
+        get_wallet_cache().put(wallet_read, cache_version)
+        return wallet_read
+
+    async def get_all_wallets(
+            self,
+            after: Optional[UUID] = None,
+            limit: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async with await self.db_connection_manager.get_read_session() as session:
+            async for row in crud_wallet.stream_wallets(session, after, limit, settings.WALLETS_STREAM_BATCH_SIZE):
+                yield row
+
+    @traced
+    async def create_wallet_by_id(self, wallet_id: UUID, initial_balance: int) -> Wallet:
+        async def create(session: AsyncSession) -> Wallet:
+            try:
+                wallet = await crud_wallet.create_wallet_by_id(session, wallet_id, initial_balance)
+            except IntegrityError:
+                raise WalletAlreadyExistException()
+            # The initial balance has no operation behind it, reconciliation starts from it.
+            await crud_checkpoint.create_checkpoint(session, wallet.id, wallet.balance)
+            return wallet
+
+        return await self.db_connection_manager.run_transaction(create)
+
+    @traced
+    async def import_wallets(self, rows: AsyncIterable[Tuple[int, UUID, int]]) -> WalletImportRead:
+        async with self.db_connection_manager.get_raw_connection() as conn:
+            staged, imported, duplicates = await crud_wallet_import.import_wallets(
+                conn, rows, settings.WALLET_IMPORT_MAX_REPORTED_DUPLICATES
+            )
+        return WalletImportRead(
+            imported=imported,
+            duplicate_count=staged - imported,
+            duplicates=[WalletImportDuplicate(line=row["line"], id=row["id"]) for row in duplicates],
+        )
 
 
 class InsufficientFundsException(Exception):
@@ -92,6 +610,59 @@ class WalletAlreadyExistException(Exception):
     pass
 
 
+class StripeCountDecreaseException(Exception):
+    pass
+
+
+class IdempotencyKeyReusedException(Exception):
+    pass
+
+
+class BatchOperationException(Exception):
+    def __init__(self, index: int, cause: Exception):
+        super().__init__(index, cause)
+        self.index = index
+        self.cause = cause
+
+
+IDEMPOTENT_ERRORS = {
+    "insufficient_funds": InsufficientFundsException,
+    "unsupported_operation": UnsupportedOperationException,
+}
+
+EXPORT_QUEUE_SIZE = 16
+
+# session.info keys for the stripes a transaction deposits to.
+WITHDRAWING_WALLETS = "withdrawing_wallets"
+DEPOSIT_STRIPES = "deposit_stripes"
+
+in_flight_idempotent_operations: Dict[str, Tuple[Tuple[UUID, OperationType, int], asyncio.Future]] = {}
+
+
+# Shared by the worker's requests. Created on first use like the engines, importing the module doesn't read settings.
+@lru_cache
+def get_operation_combiner() -> WalletOperationCombiner:
+    return WalletOperationCombiner(max_batch_size=settings.OPERATION_COMBINER_MAX_BATCH)
+
+
+@lru_cache
+def get_group_commit_scheduler() -> GroupCommitScheduler:
+    return GroupCommitScheduler(
+        window_seconds=settings.GROUP_COMMIT_WINDOW_MS / 1000,
+        max_size=settings.GROUP_COMMIT_MAX_SIZE,
+    )
+
+
+@lru_cache
+def get_wallet_cache() -> WalletCache:
+    return WalletCache(max_size=settings.WALLET_CACHE_MAX_SIZE, ttl_seconds=settings.WALLET_CACHE_TTL_SECONDS)
+
+
+@lru_cache
+def get_wallet_cache_invalidator() -> WalletCacheInvalidator:
+    return WalletCacheInvalidator(get_wallet_cache(), settings.DATABASE_URL)
+
+
 async def get_wallet_service(
     db_conn_manager: DBConnectionManager = Depends(DBConnectionManager),
 ) -> WalletService:
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.db.base import DBConnectionManager
+from app.models.enums import OperationType
+import app.crud.wallet as crud_wallet
+import app.crud.operation as crud_op
+import app.crud.raw as crud_raw
+
+
+log = logging.getLogger("uvicorn.error")
+
+# Hot statements are run for a wallet that can't exist: they match no rows, but get compiled and prepared.
+NO_WALLET_ID = UUID(int=0)
+
+
+async def prepare_hot_statements(conn: AsyncConnection, read_only: bool) -> None:
+    # Runs in a transaction that is rolled back when the connection returns to the pool.
+    session = AsyncSession(bind=conn)
+    await crud_wallet.read_wallet(session, NO_WALLET_ID)
+    await crud_wallet.read_wallet_with_balance(session, NO_WALLET_ID)
+    await crud_op.list_operations_by_wallet(session, NO_WALLET_ID, limit=1)
+    raw = (await conn.get_raw_connection()).driver_connection
+    if settings.REPOSITORY_BACKEND == "asyncpg":
+        await crud_raw.read_wallet_with_balance(raw, NO_WALLET_ID)
+    if read_only:
+        return
+    await crud_wallet.get_unstriped_wallet_for_update(session, NO_WALLET_ID)
+    await crud_wallet.get_wallets_for_update(session, [NO_WALLET_ID])
+    if settings.APPLY_OPERATION_MODE == "optimistic":
+        await crud_wallet.read_wallet_version(session, NO_WALLET_ID)
+        await crud_wallet.update_balance_if_version(session, NO_WALLET_ID, 0, 1)
+    for op_type in (OperationType.DEPOSIT, OperationType.WITHDRAW):
+        await crud_op.apply_operation_conditionally(session, NO_WALLET_ID, op_type, 1)
+        if settings.REPOSITORY_BACKEND == "asyncpg":
+            await crud_raw.apply_operation(raw, NO_WALLET_ID, NO_WALLET_ID, op_type, 1)
+
+
+async def warm_up_pool(retry_delay: float = 1.0) -> None:
+    # Retries until the database is reachable; the app reports ready only after this returns.
+    while True:
+        try:
+            await DBConnectionManager.warm_up(settings.DB_POOL_MIN_SIZE, prepare_hot_statements)
+        except Exception:
+            log.warning("Connection pool warm-up failed, retrying.", exc_info=True)
+            await asyncio.sleep(retry_delay)
+        else:
+            log.info("Connection pool warmed up with %s connections.", settings.DB_POOL_MIN_SIZE)
+            return
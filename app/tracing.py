@@ -0,0 +1,277 @@
+import asyncio
+import cProfile
+import functools
+import json
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from uuid import uuid4
+
+from asyncpg import Connection
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+log = logging.getLogger("uvicorn.error")
+
+# Statements shown in the log line, slowest first.
+SLOWEST_STATEMENTS = 5
+STATEMENT_PREVIEW_CHARS = 200
+
+
+@dataclass
+class StatementTrace:
+    statement: str
+    duration: float
+    rows: Optional[int]
+
+
+@dataclass
+class RequestTrace:
+    method: str
+    path: str
+    trace_id: str = field(default_factory=lambda: uuid4().hex)
+    statements: List[StatementTrace] = field(default_factory=list)
+    # Phase name -> [total seconds, count]. Phases nest (a flush runs inside a service call), so they don't add up.
+    phases: Dict[str, List[float]] = field(default_factory=dict)
+
+    def add_phase(self, name: str, duration: float) -> None:
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += duration
+        totals[1] += 1
+
+    def summary(self, wall: float, status: str) -> Dict[str, Any]:
+        service = sum(total for name, (total, _) in self.phases.items() if name.startswith("service."))
+        slowest = sorted(self.statements, key=lambda s: s.duration, reverse=True)[:SLOWEST_STATEMENTS]
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "wall_ms": _ms(wall),
+            # Routing, request validation and response serialization: what the service calls don't cover.
+            "outside_service_ms": _ms(wall - service) if service else None,
+            "sql_count": len(self.statements),
+            "sql_ms": _ms(sum(s.duration for s in self.statements)),
+            "sql_rows": sum(s.rows for s in self.statements if s.rows is not None),
+            "phases": {name: {"ms": _ms(total), "count": count} for name, (total, count) in self.phases.items()},
+            "slowest_sql": [
+                {"ms": _ms(s.duration), "rows": s.rows, "statement": _preview(s.statement)} for s in slowest
+            ],
+        }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _preview(statement: str) -> str:
+    return " ".join(statement.split())[:STATEMENT_PREVIEW_CHARS]
+
+
+# Set only for sampled requests. Tasks serving several requests (combiner batches, commit groups) start
+# with an empty context and record into a batch_trace of their own.
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def record_phase(name: str, duration: float) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_phase(name, duration)
+
+
+@contextmanager
+def trace_phase(name: str) -> Iterator[None]:
+    if current_trace.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def traced(method):
+    # Records the wall time of a WalletService call as the "service.<name>" phase.
+    phase = f"service.{method.__name__}"
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with trace_phase(phase):
+            return await method(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def batch_trace(name: str, caller_trace_ids: Iterable[Optional[str]]) -> Iterator[None]:
+    # Logged as "Batch trace: {...}" with the ids of the traced requests it served, if any of them is traced.
+    callers = [trace_id for trace_id in caller_trace_ids if trace_id is not None]
+    if not callers:
+        yield
+        return
+    trace = RequestTrace(method="BATCH", path=name)
+    token = current_trace.set(trace)
+    status = "error"
+    started = time.perf_counter()
+    try:
+        yield
+        status = "ok"
+    finally:
+        wall = time.perf_counter() - started
+        current_trace.reset(token)
+        summary = trace.summary(wall, status)
+        summary["callers"] = callers
+        log.info("Batch trace: %s", json.dumps(summary, separators=(",", ":")))
+
+
+@contextmanager
+def trace_raw_connection(conn: Connection) -> Iterator[None]:
+    # Statements on raw asyncpg connections bypass SQLAlchemy's events; asyncpg reports them without row counts.
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    def record(query) -> None:
+        trace.statements.append(StatementTrace(query.query, query.elapsed, None))
+
+    with conn.query_logger(record):
+        yield
+
+
+_STARTED = "trace_statement_started"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if current_trace.get() is not None:
+        conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    trace = current_trace.get()
+    started = conn.info.get(_STARTED)
+    if trace is None or not started:
+        return
+    rows = cursor.rowcount
+    trace.statements.append(StatementTrace(statement, time.perf_counter() - started.pop(), rows if rows >= 0 else None))
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute isn't called for a failed statement.
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(_STARTED):
+        connection.info[_STARTED].pop()
+
+
+def _session_phase(name: str):
+    key = f"trace_{name}_started"
+
+    def before(session, *args) -> None:
+        if current_trace.get() is not None:
+            session.info[key] = time.perf_counter()
+
+    def after(session, *args) -> None:
+        started = session.info.pop(key, None)
+        if started is not None:
+            record_phase(name, time.perf_counter() - started)
+
+    return before, after
+
+
+def install_sql_tracing(engine: Engine) -> None:
+    # Handlers cost a context variable lookup per statement while no request is traced.
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+_flush_started, _flush_finished = _session_phase("flush")
+_commit_started, _commit_finished = _session_phase("commit")
+event.listen(Session, "before_flush", _flush_started)
+event.listen(Session, "after_flush_postexec", _flush_finished)
+# Includes the final flush.
+event.listen(Session, "before_commit", _commit_started)
+event.listen(Session, "after_commit", _commit_finished)
+
+
+class TracingMiddleware:
+    # Traces TRACE_SAMPLE_RATE of requests, and every request carrying the TRACE_HEADER, into one log line.
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._profiling = False
+
+    def _sampled(self, scope: Scope) -> bool:
+        header = settings.TRACE_HEADER.lower().encode()
+        if any(name == header for name, _ in scope["headers"]):
+            return True
+        return settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        trace = RequestTrace(method=scope["method"], path=scope["path"])
+        token = current_trace.set(trace)
+        # cProfile sees the whole event loop, so concurrent requests show up in the profile too,
+        # and only one request is profiled at a time.
+        profiler = None
+        if settings.TRACE_PROFILE_DIR and not self._profiling:
+            self._profiling = True
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this interpreter.
+                log.warning("Could not start profiling %s %s.", trace.method, trace.path, exc_info=True)
+                profiler, self._profiling = None, False
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            wall = time.perf_counter() - started
+            current_trace.reset(token)
+            summary = trace.summary(wall, status)
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                summary["profile"] = await self._dump_profile(profiler, trace)
+            log.info("Request trace: %s", json.dumps(summary, separators=(",", ":")))
+
+    @staticmethod
+    async def _dump_profile(profiler: cProfile.Profile, trace: RequestTrace) -> Optional[str]:
+        name = re.sub(r"[^A-Za-z0-9]+", "_", f"{trace.method}{trace.path}").strip("_")
+        path = Path(settings.TRACE_PROFILE_DIR) / f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid4().hex[:8]}_{name}.prof"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(profiler.dump_stats, path)
+        except OSError:
+            log.warning("Could not write profile to %s.", path, exc_info=True)
+            return None
+        return str(path)
@@ -0,0 +1,53 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+METRICS: List[Tuple[str, Tuple[str, ...], bool]] = [
+    # (label, path in scenario result, higher is better)
+    ("throughput rps", ("throughput_rps",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("error rate", ("error_rate",), False),
+    ("lock waiters", ("postgres", "lock_waiters_mean"), False),
+    ("cpu ms/request", ("server_cpu", "cpu_ms_per_request"), False),
+]
+
+
+def _get(result: Dict, path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or result.get(key) is None:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(baseline: Dict, candidate: Dict) -> List[str]:
+    lines = [
+        f"baseline:  {baseline['meta']['label']} ({baseline['meta']['git_commit']})",
+        f"candidate: {candidate['meta']['label']} ({candidate['meta']['git_commit']})",
+    ]
+    for scenario in baseline["scenarios"]:
+        if scenario not in candidate["scenarios"]:
+            continue
+        lines.append(f"\n{scenario}")
+        for label, path, higher_is_better in METRICS:
+            before = _get(baseline["scenarios"][scenario], path)
+            after = _get(candidate["scenarios"][scenario], path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            better = change > 0 if higher_is_better else change < 0
+            mark = "" if abs(change) < 0.05 else (" better" if better else " WORSE")
+            lines.append(f"  {label:<15} {before:>10.2f} -> {after:>10.2f}  {change:>+7.1%}{mark}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    args = parser.parse_args()
+    print("\n".join(compare(json.loads(args.baseline.read_text()), json.loads(args.candidate.read_text()))))
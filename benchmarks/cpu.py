@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterator
+
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _descendants(pid: int) -> Iterator[int]:
+    yield pid
+    for children in Path(f"/proc/{pid}/task").glob("*/children"):
+        for child in children.read_text().split():
+            yield from _descendants(int(child))
+
+
+def _cpu_seconds(pid: int) -> float:
+    # utime and stime, fields 14 and 15 of /proc/<pid>/stat; the command name in field 2 may contain spaces.
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def process_tree_cpu_seconds(pid: int) -> Dict[int, float]:
+    usage = {}
+    for process in _descendants(pid):
+        try:
+            usage[process] = _cpu_seconds(process)
+        except FileNotFoundError:
+            pass
+    return usage
+
+
+class ProcessCpuMonitor:
+    # CPU time used by the server (e.g. uvicorn master and its workers) while a scenario runs. Linux only,
+    # the server must run on the same host as the benchmark.
+    def __init__(self, pid: int):
+        self._pid = pid
+        self._started: Dict[int, float] = {}
+
+    def start(self) -> None:
+        self._started = process_tree_cpu_seconds(self._pid)
+
+    def stop(self, requests: int) -> Dict:
+        finished = process_tree_cpu_seconds(self._pid)
+        cpu_seconds = sum(used - self._started.get(process, 0.0) for process, used in finished.items())
+        return {
+            "cpu_seconds": cpu_seconds,
+            "cpu_ms_per_request": cpu_seconds * 1000 / requests if requests else 0.0,
+        }
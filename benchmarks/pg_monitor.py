@@ -0,0 +1,79 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+
+WAIT_EVENTS_QUERY = """
+SELECT coalesce(wait_event_type, 'CPU') || ':' || coalesce(wait_event, 'running') AS wait, count(*) AS n
+FROM pg_stat_activity
+WHERE datname = current_database() AND state = 'active' AND pid <> pg_backend_pid()
+GROUP BY 1
+"""
+
+LOCK_WAITERS_QUERY = """
+SELECT count(*) FILTER (WHERE NOT granted) AS waiting,
+       count(*) FILTER (WHERE NOT granted AND locktype = 'transactionid') AS waiting_on_rows
+FROM pg_locks
+WHERE database = (SELECT oid FROM pg_database WHERE datname = current_database()) OR locktype = 'transactionid'
+"""
+
+LONGEST_LOCK_WAIT_QUERY = """
+SELECT coalesce(extract(epoch FROM max(now() - query_start)) * 1000, 0)
+FROM pg_stat_activity
+WHERE datname = current_database() AND wait_event_type = 'Lock'
+"""
+
+
+class PostgresLockMonitor:
+    # Samples lock waiters and wait events while a scenario runs.
+    def __init__(self, database_url: str, interval_s: float = 0.2):
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.samples = 0
+        self.waiting_total = 0
+        self.waiting_max = 0
+        self.row_waiting_total = 0
+        self.longest_lock_waiting_query_ms = 0.0
+        self.wait_events: Counter = Counter()
+
+    async def start(self) -> None:
+        self._reset()
+        self._conn = await asyncpg.connect(self._dsn)
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> Dict:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._conn.close()
+        return {
+            "samples": self.samples,
+            "lock_waiters_mean": self.waiting_total / self.samples if self.samples else 0.0,
+            "lock_waiters_max": self.waiting_max,
+            "row_lock_waiters_mean": self.row_waiting_total / self.samples if self.samples else 0.0,
+            "longest_lock_waiting_query_ms": self.longest_lock_waiting_query_ms,
+            "wait_events": dict(self.wait_events.most_common()),
+        }
+
+    async def _sample(self) -> None:
+        while True:
+            for row in await self._conn.fetch(WAIT_EVENTS_QUERY):
+                self.wait_events[row["wait"]] += row["n"]
+            locks = await self._conn.fetchrow(LOCK_WAITERS_QUERY)
+            self.waiting_total += locks["waiting"]
+            self.waiting_max = max(self.waiting_max, locks["waiting"])
+            self.row_waiting_total += locks["waiting_on_rows"]
+            longest = await self._conn.fetchval(LONGEST_LOCK_WAIT_QUERY)
+            self.longest_lock_waiting_query_ms = max(self.longest_lock_waiting_query_ms, float(longest))
+            self.samples += 1
+            await asyncio.sleep(self._interval_s)
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+import httpx
+
+from benchmarks.cpu import ProcessCpuMonitor
+from benchmarks.pg_monitor import PostgresLockMonitor
+from benchmarks.scenarios import SCENARIOS, TimedClient, Workload
+from benchmarks.stats import ScenarioRecorder
+
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load and latency benchmarks for the wallet service.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", help="If given, lock waits and wait events are sampled during each run.")
+    parser.add_argument("--server-pid", type=int,
+                        help="If given, CPU time of this process and its children is reported per request.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, may be repeated. All scenarios by default.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per scenario.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of unrecorded load before each scenario.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--wallets", type=int, default=1000)
+    parser.add_argument("--initial-balance", default="1000000.00")
+    parser.add_argument("--zipf-s", type=float, default=1.2, help="Skew of hot wallet selection.")
+    parser.add_argument("--history-page-size", type=int, default=50)
+    parser.add_argument("--history-max-pages", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    return parser.parse_args(argv)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed_wallets(client: httpx.AsyncClient, count: int, balance: str) -> List[UUID]:
+    wallet_ids = [uuid4() for _ in range(count)]
+    semaphore = asyncio.Semaphore(20)
+
+    async def create(wallet_id: UUID) -> None:
+        async with semaphore:
+            r = await client.post("/api/v1/wallets", json={"id": str(wallet_id), "balance": balance})
+            r.raise_for_status()
+
+    await asyncio.gather(*[create(wallet_id) for wallet_id in wallet_ids])
+    return wallet_ids
+
+
+async def drive(client: TimedClient, scenario: str, workload: Workload, concurrency: int, duration: float, seed: int):
+    step = SCENARIOS[scenario]
+    deadline = time.perf_counter() + duration
+
+    async def worker(rng: random.Random) -> None:
+        while time.perf_counter() < deadline:
+            await step(client, workload, rng)
+
+    await asyncio.gather(*[worker(random.Random(seed + i)) for i in range(concurrency)])
+
+
+async def run_scenario(http: httpx.AsyncClient, scenario: str, workload: Workload, args: argparse.Namespace) -> Dict:
+    if args.warmup > 0:
+        await drive(TimedClient(http, ScenarioRecorder()), scenario, workload, args.concurrency, args.warmup, args.seed)
+
+    recorder = ScenarioRecorder()
+    monitor = PostgresLockMonitor(args.database_url) if args.database_url else None
+    cpu_monitor = ProcessCpuMonitor(args.server_pid) if args.server_pid else None
+    if monitor is not None:
+        await monitor.start()
+    if cpu_monitor is not None:
+        cpu_monitor.start()
+    started = time.perf_counter()
+    try:
+        await drive(TimedClient(http, recorder), scenario, workload, args.concurrency, args.duration, args.seed)
+    finally:
+        elapsed = time.perf_counter() - started
+        postgres = await monitor.stop() if monitor is not None else None
+
+    result = recorder.summary(elapsed)
+    result["postgres"] = postgres
+    result["server_cpu"] = cpu_monitor.stop(result["requests"]) if cpu_monitor is not None else None
+    return result
+
+
+async def main(args: argparse.Namespace) -> Path:
+    scenarios = args.scenario or list(SCENARIOS)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0) as http:
+        wallet_ids = await seed_wallets(http, args.wallets, args.initial_balance)
+        workload = Workload.create(wallet_ids, args.zipf_s, args.history_page_size, args.history_max_pages)
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = await run_scenario(http, scenario, workload, args)
+            print_summary(scenario, results[scenario])
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "meta": {
+            "label": args.label,
+            "git_commit": git_commit(),
+            "timestamp": now.isoformat(),
+            "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k != "database_url"},
+        },
+        "scenarios": results,
+    }
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / f"{now:%Y%m%dT%H%M%S}_{args.label}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {path}")
+    return path
+
+
+def print_summary(scenario: str, result: Dict) -> None:
+    latency = result["latency_ms"]
+    line = (
+        f"{scenario:<12} {result['throughput_rps']:>9.1f} rps  "
+        f"p50 {latency['p50']:>7.1f} ms  p95 {latency['p95']:>7.1f} ms  p99 {latency['p99']:>7.1f} ms  "
+        f"errors {result['error_rate']:.2%}"
+    )
+    if result["postgres"] is not None:
+        line += f"  lock waiters {result['postgres']['lock_waiters_mean']:.1f}"
+    if result["server_cpu"] is not None:
+        line += f"  cpu {result['server_cpu']['cpu_ms_per_request']:.2f} ms/req"
+    print(line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,122 @@
+import bisect
+import random
+import time
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+import httpx
+
+from benchmarks.stats import ScenarioRecorder
+
+
+@dataclass
+class Workload:
+    wallet_ids: List[UUID]
+    zipf_weights: List[float]
+    history_page_size: int
+    history_max_pages: int
+
+    @classmethod
+    def create(cls, wallet_ids: List[UUID], zipf_s: float, history_page_size: int, history_max_pages: int):
+        weights = [1 / rank ** zipf_s for rank in range(1, len(wallet_ids) + 1)]
+        return cls(wallet_ids, list(accumulate(weights)), history_page_size, history_max_pages)
+
+    def uniform_wallet(self, rng: random.Random) -> UUID:
+        return rng.choice(self.wallet_ids)
+
+    def zipf_wallet(self, rng: random.Random) -> UUID:
+        # wallet_ids[0] is the hottest wallet.
+        point = rng.random() * self.zipf_weights[-1]
+        return self.wallet_ids[bisect.bisect_left(self.zipf_weights, point)]
+
+
+class TimedClient:
+    def __init__(self, client: httpx.AsyncClient, recorder: ScenarioRecorder):
+        self._client = client
+        self._recorder = recorder
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self._client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self._recorder.record(endpoint, (time.perf_counter() - started) * 1000, type(e).__name__)
+            return None
+        self._recorder.record(endpoint, (time.perf_counter() - started) * 1000, str(response.status_code))
+        return response
+
+
+# A step performs one logical action, possibly several requests.
+Step = Callable[[TimedClient, Workload, random.Random], Awaitable[None]]
+
+
+async def _operation(client: TimedClient, wallet_id: UUID, rng: random.Random) -> None:
+    op_type = "DEPOSIT" if rng.random() < 0.6 else "WITHDRAW"
+    amount = f"{rng.randint(1, 1000) / 100:.2f}"
+    await client.request(
+        f"POST operation {op_type}",
+        "POST",
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": op_type, "amount": amount},
+    )
+
+
+async def _balance(client: TimedClient, wallet_id: UUID) -> None:
+    await client.request("GET wallet", "GET", f"/api/v1/wallets/{wallet_id}")
+
+
+async def _history(client: TimedClient, workload: Workload, wallet_id: UUID) -> None:
+    cursor: Optional[str] = None
+    for _ in range(workload.history_max_pages):
+        params = {"limit": workload.history_page_size}
+        if cursor is not None:
+            params["cursor"] = cursor
+        r = await client.request("GET history page", "GET", f"/api/v1/wallets/{wallet_id}/operation", params=params)
+        if r is None or r.status_code != 200:
+            break
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+
+async def uniform(client: TimedClient, workload: Workload, rng: random.Random) -> None:
+    await _operation(client, workload.uniform_wallet(rng), rng)
+
+
+async def hot_wallet(client: TimedClient, workload: Workload, rng: random.Random) -> None:
+    await _operation(client, workload.zipf_wallet(rng), rng)
+
+
+async def read_heavy(client: TimedClient, workload: Workload, rng: random.Random) -> None:
+    wallet_id = workload.zipf_wallet(rng)
+    if rng.random() < 0.9:
+        await _balance(client, wallet_id)
+    else:
+        await _operation(client, wallet_id, rng)
+
+
+async def history(client: TimedClient, workload: Workload, rng: random.Random) -> None:
+    await _history(client, workload, workload.zipf_wallet(rng))
+
+
+async def mixed(client: TimedClient, workload: Workload, rng: random.Random) -> None:
+    roll = rng.random()
+    if roll < 0.55:
+        await _balance(client, workload.zipf_wallet(rng))
+    elif roll < 0.85:
+        await _operation(client, workload.zipf_wallet(rng), rng)
+    elif roll < 0.95:
+        await _operation(client, workload.uniform_wallet(rng), rng)
+    else:
+        await _history(client, workload, workload.uniform_wallet(rng))
+
+
+SCENARIOS: Dict[str, Step] = {
+    "uniform": uniform,
+    "hot_wallet": hot_wallet,
+    "read_heavy": read_heavy,
+    "history": history,
+    "mixed": mixed,
+}
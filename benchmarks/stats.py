@@ -0,0 +1,62 @@
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+@dataclass
+class ScenarioRecorder:
+    latencies_ms: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+    def record(self, endpoint: str, latency_ms: float, status: str) -> None:
+        self.latencies_ms[endpoint].append(latency_ms)
+        self.statuses[endpoint][status] += 1
+
+    def summary(self, duration_s: float) -> Dict:
+        all_latencies = [latency for values in self.latencies_ms.values() for latency in values]
+        all_statuses: Counter = Counter()
+        for counter in self.statuses.values():
+            all_statuses.update(counter)
+        return {
+            "requests": len(all_latencies),
+            "duration_s": duration_s,
+            "throughput_rps": len(all_latencies) / duration_s if duration_s else 0.0,
+            "latency_ms": summarize_latencies(all_latencies),
+            "status_counts": dict(all_statuses),
+            "error_rate": _error_rate(all_statuses),
+            "by_endpoint": {
+                endpoint: {
+                    "requests": len(values),
+                    "latency_ms": summarize_latencies(values),
+                    "status_counts": dict(self.statuses[endpoint]),
+                    "error_rate": _error_rate(self.statuses[endpoint]),
+                }
+                for endpoint, values in self.latencies_ms.items()
+            },
+        }
+
+
+def _error_rate(statuses: Counter) -> float:
+    # Rejections with 4xx (e.g. insufficient funds) are expected answers, not errors.
+    total = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if status[0] not in "234")
+    return errors / total if total else 0.0
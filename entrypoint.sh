@@ -13,4 +13,9 @@ if [ "${RUN_MIGRATIONS:-false}" = "true" ]; then
     echo "Migrations complete."
 fi
 
+if [ -n "${PROMETHEUS_MULTIPROC_DIR}" ]; then
+    rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+    mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+fi
+
 exec "$@"
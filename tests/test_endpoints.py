@@ -1,12 +1,16 @@
+import json
+from datetime import datetime, timezone
 from uuid import uuid4
 from decimal import Decimal
 
+from app.models.enums import OperationType
+from app.models.operation import Operation
 from app.models.wallet import Wallet
 
 
 def test_deposit_and_withdraw_flow(db_session, client):
     wallet_id = uuid4()
-    w = Wallet(id=wallet_id, balance=Decimal("0.00"))
+    w = Wallet(id=wallet_id, balance=0)
     db_session.add(w)
     db_session.commit()
 
@@ -37,3 +41,254 @@ def test_deposit_and_withdraw_flow(db_session, client):
     r6 = client.get(f"/api/v1/wallets/{wallet_id}")
     assert float(r6.json()["balance"]) == 70.0
 
+
+
+def test_batch_operations_atomic_and_per_item(db_session, client):
+    first_id, second_id, missing_id = uuid4(), uuid4(), uuid4()
+    db_session.add_all([
+        Wallet(id=first_id, balance=5000),
+        Wallet(id=second_id, balance=0),
+    ])
+    db_session.commit()
+
+    operations = [
+        {"wallet_id": str(first_id), "operation_type": "WITHDRAW", "amount": 20.00},
+        {"wallet_id": str(second_id), "operation_type": "DEPOSIT", "amount": 20.00},
+        {"wallet_id": str(second_id), "operation_type": "WITHDRAW", "amount": 100.00},
+        {"wallet_id": str(missing_id), "operation_type": "DEPOSIT", "amount": 1.00},
+    ]
+
+    r = client.post("/api/v1/operations/batch", json={"operations": operations, "atomic": True})
+    assert r.status_code == 400, r.text
+    assert "#2" in r.json()["detail"]
+    assert Decimal(client.get(f"/api/v1/wallets/{first_id}").json()["balance"]) == 50.0
+    assert Decimal(client.get(f"/api/v1/wallets/{second_id}").json()["balance"]) == 0.0
+
+    r2 = client.post("/api/v1/operations/batch", json={"operations": operations, "atomic": False})
+    assert r2.status_code == 200, r2.text
+    results = r2.json()["results"]
+    assert [res["status_code"] for res in results] == [201, 201, 400, 404]
+    assert results[0]["operation"]["wallet_id"] == str(first_id)
+    assert Decimal(client.get(f"/api/v1/wallets/{first_id}").json()["balance"]) == 30.0
+    assert Decimal(client.get(f"/api/v1/wallets/{second_id}").json()["balance"]) == 20.0
+
+
+def test_operation_history_is_paginated_by_cursor(db_session, client):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.commit()
+    for amount in range(1, 6):
+        r = client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "DEPOSIT", "amount": amount})
+        assert r.status_code == 201, r.text
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor is not None:
+            params["cursor"] = cursor
+        r = client.get(f"/api/v1/wallets/{wallet_id}/operation", params=params)
+        assert r.status_code == 200, r.text
+        assert len(r.json()) <= 2
+        seen.extend(Decimal(op["amount"]) for op in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [5, 4, 3, 2, 1]
+    r = client.get(f"/api/v1/wallets/{wallet_id}/operation", params={"cursor": "garbage"})
+    assert r.status_code == 400
+
+
+def test_wallets_are_streamed_in_id_order(db_session, client):
+    wallet_ids = sorted(uuid4() for _ in range(3))
+    db_session.add_all([Wallet(id=wallet_id, balance=100) for wallet_id in wallet_ids])
+    db_session.commit()
+
+    r = client.get("/api/v1/wallets")
+    assert r.status_code == 200, r.text
+    assert [w["id"] for w in r.json()] == [str(wallet_id) for wallet_id in wallet_ids]
+
+    r2 = client.get(
+        "/api/v1/wallets",
+        params={"after": str(wallet_ids[0]), "limit": 1},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert r2.status_code == 200, r2.text
+    assert [json.loads(line)["id"] for line in r2.text.splitlines()] == [str(wallet_ids[1])]
+
+
+def test_idempotency_key_replays_first_result(db_session, client):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.commit()
+    key = str(uuid4())
+    payload = {"operation_type": "DEPOSIT", "amount": 100.00}
+
+    r = client.post(f"/api/v1/wallets/{wallet_id}/operation", json=payload, headers={"Idempotency-Key": key})
+    assert r.status_code == 201, r.text
+    r2 = client.post(f"/api/v1/wallets/{wallet_id}/operation", json=payload, headers={"Idempotency-Key": key})
+    assert r2.status_code == 201, r2.text
+    assert r2.json() == r.json()
+    assert Decimal(client.get(f"/api/v1/wallets/{wallet_id}").json()["balance"]) == 100.0
+
+    r3 = client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": 100.00},
+        headers={"Idempotency-Key": key},
+    )
+    assert r3.status_code == 422, r3.text
+
+
+def test_idempotency_key_on_missing_wallet_is_not_found(client):
+    r = client.post(
+        f"/api/v1/wallets/{uuid4()}/operation",
+        json={"operation_type": "DEPOSIT", "amount": 100.00},
+        headers={"Idempotency-Key": str(uuid4())},
+    )
+    assert r.status_code == 404, r.text
+
+
+def test_striped_wallet_keeps_balance_contract(db_session, client):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=1000))
+    db_session.commit()
+
+    r = client.put(f"/api/v1/wallets/{wallet_id}/stripes", json={"stripe_count": 4})
+    assert r.status_code == 200, r.text
+    assert Decimal(r.json()["balance"]) == 10.0
+
+    for _ in range(8):
+        r = client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "DEPOSIT", "amount": 5.00})
+        assert r.status_code == 201, r.text
+    assert Decimal(client.get(f"/api/v1/wallets/{wallet_id}").json()["balance"]) == 50.0
+
+    r = client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "WITHDRAW", "amount": 45.00})
+    assert r.status_code == 201, r.text
+    r = client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "WITHDRAW", "amount": 10.00})
+    assert r.status_code == 400, r.text
+    assert Decimal(client.get(f"/api/v1/wallets/{wallet_id}").json()["balance"]) == 5.0
+
+    r = client.put(f"/api/v1/wallets/{wallet_id}/stripes", json={"stripe_count": 2})
+    assert r.status_code == 400, r.text
+
+
+def test_metrics_report_operation_outcomes(db_session, client):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.commit()
+
+    client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "DEPOSIT", "amount": 1.00})
+    client.post(f"/api/v1/wallets/{wallet_id}/operation", json={"operation_type": "WITHDRAW", "amount": 5.00})
+    client.post(f"/api/v1/wallets/{uuid4()}/operation", json={"operation_type": "DEPOSIT", "amount": 1.00})
+
+    r = client.get("/metrics")
+    assert r.status_code == 200, r.text
+    for outcome in ("applied", "insufficient_funds", "wallet_not_found"):
+        assert f'wallet_operation_outcomes_total{{outcome="{outcome}"}}' in r.text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/v1/wallets/{wallet_id}/operation"' in r.text
+    assert "wallet_lock_wait_seconds_count" in r.text
+    assert 'db_pool_checked_out_connections{pool="primary"}' in r.text
+
+
+def test_operation_history_is_filtered_by_time_range(db_session, client):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.add_all([
+        Operation(
+            wallet_id=wallet_id,
+            operation_type=OperationType.DEPOSIT,
+            amount=month * 100,
+            created_at=datetime(2025, month, 1, tzinfo=timezone.utc),
+        )
+        for month in range(1, 7)
+    ])
+    db_session.commit()
+
+    r = client.get(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        params={"since": "2025-02-01T00:00:00Z", "until": "2025-05-01T00:00:00Z"},
+    )
+    assert r.status_code == 200, r.text
+    assert [Decimal(op["amount"]) for op in r.json()] == [4, 3, 2]
+
+
+def test_wallets_are_imported_with_duplicates_reported(db_session, client):
+    existing_id, first_id, second_id = uuid4(), uuid4(), uuid4()
+    db_session.add(Wallet(id=existing_id, balance=100))
+    db_session.commit()
+
+    body = f"id,balance\n{first_id},10.50\n{existing_id},5\n{second_id},0\n{first_id},99\n"
+    r = client.post("/api/v1/wallets/import", content=body, headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    assert r.json() == {
+        "imported": 2,
+        "duplicate_count": 2,
+        "duplicates": [{"line": 3, "id": str(existing_id)}, {"line": 5, "id": str(first_id)}],
+    }
+    assert Decimal(client.get(f"/api/v1/wallets/{first_id}").json()["balance"]) == Decimal("10.50")
+    assert Decimal(client.get(f"/api/v1/wallets/{existing_id}").json()["balance"]) == Decimal("1.00")
+
+    r2 = client.post(
+        "/api/v1/wallets/import",
+        content=f'{{"id": "{uuid4()}", "balance": 1}}\n{{"id": "oops", "balance": 1}}\n',
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert r2.status_code == 400, r2.text
+    assert db_session.query(Wallet).count() == 3
+
+
+def test_operations_are_exported_as_gzipped_csv_and_ndjson(db_session, client):
+    wallet_id, other_id = uuid4(), uuid4()
+    db_session.add_all([Wallet(id=wallet_id, balance=0), Wallet(id=other_id, balance=0)])
+    db_session.add_all([
+        Operation(
+            wallet_id=wallet_id,
+            operation_type=OperationType.DEPOSIT,
+            amount=amount,
+            created_at=datetime(2025, 1, day, tzinfo=timezone.utc),
+        )
+        for day, amount in ((1, 100), (2, 250), (3, 300))
+    ])
+    db_session.add(Operation(wallet_id=other_id, operation_type=OperationType.DEPOSIT, amount=900))
+    db_session.commit()
+
+    params = {"wallet_id": str(wallet_id), "since": "2025-01-02T00:00:00Z"}
+    r = client.get("/api/v1/operations/export", params=params, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200, r.text
+    assert r.headers["content-encoding"] == "gzip"
+    lines = r.text.splitlines()
+    assert lines[0] == "id,wallet_id,operation_type,amount,created_at,transfer_id"
+    assert [line.split(",")[3] for line in lines[1:]] == ["2.50", "3.00"]
+
+    r2 = client.get("/api/v1/operations/export", params=params, headers={"Accept": "application/x-ndjson"})
+    assert r2.status_code == 200, r2.text
+    rows = [json.loads(line) for line in r2.text.splitlines()]
+    assert [(row["wallet_id"], row["amount"]) for row in rows] == [(str(wallet_id), "2.50"), (str(wallet_id), "3.00")]
+    assert datetime.fromisoformat(rows[0]["created_at"]) == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+
+def test_transfer_moves_amount_between_wallets(db_session, client):
+    first_id, second_id = uuid4(), uuid4()
+    db_session.add_all([Wallet(id=first_id, balance=10000), Wallet(id=second_id, balance=0)])
+    db_session.commit()
+
+    r = client.post("/api/v1/transfers", json={"from_wallet_id": str(first_id), "to_wallet_id": str(second_id), "amount": 30})
+    assert r.status_code == 201, r.text
+    transfer = r.json()
+    assert [(op["wallet_id"], op["operation_type"], op["transfer_id"]) for op in transfer["operations"]] == [
+        (str(first_id), "TRANSFER_OUT", transfer["id"]),
+        (str(second_id), "TRANSFER_IN", transfer["id"]),
+    ]
+    assert Decimal(client.get(f"/api/v1/wallets/{first_id}").json()["balance"]) == 70.0
+    assert Decimal(client.get(f"/api/v1/wallets/{second_id}").json()["balance"]) == 30.0
+
+    r2 = client.post("/api/v1/transfers", json={"from_wallet_id": str(second_id), "to_wallet_id": str(first_id), "amount": 31})
+    assert r2.status_code == 400, r2.text
+    r3 = client.post("/api/v1/transfers", json={"from_wallet_id": str(first_id), "to_wallet_id": str(uuid4()), "amount": 1})
+    assert r3.status_code == 404, r3.text
+    assert Decimal(client.get(f"/api/v1/wallets/{first_id}").json()["balance"]) == 70.0
+    r4 = client.post("/api/v1/transfers", json={"from_wallet_id": str(first_id), "to_wallet_id": str(first_id), "amount": 1})
+    assert r4.status_code == 422, r4.text
+    r5 = client.post(f"/api/v1/wallets/{first_id}/operation", json={"operation_type": "TRANSFER_IN", "amount": 1})
+    assert r5.status_code == 400, r5.text
@@ -0,0 +1,63 @@
+import asyncio
+import gzip
+import os
+from datetime import date, datetime, timezone
+from uuid import uuid4
+
+import asyncpg
+
+from app.maintenance.partitions import create_partitions, detach_partitions, list_partitions
+from app.models.enums import OperationType
+from app.models.operation import Operation
+from app.models.wallet import Wallet
+
+
+def run_with_connection(scenario):
+    async def main():
+        conn = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+        try:
+            return await scenario(conn)
+        finally:
+            await conn.close()
+
+    return asyncio.run(main())
+
+
+def test_partitions_are_created_and_archived(db_session, tmp_path):
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.add_all([
+        Operation(
+            wallet_id=wallet_id,
+            operation_type=OperationType.DEPOSIT,
+            amount=100,
+            created_at=datetime(2025, month, 15, tzinfo=timezone.utc),
+        )
+        for month in (1, 2, 3)
+    ])
+    db_session.commit()
+
+    async def scenario(conn):
+        # Detached partitions are standalone tables, a previous run may have left one behind.
+        await conn.execute("DROP TABLE IF EXISTS operations_p202502")
+        created = await create_partitions(conn, months_ahead=2, today=date(2025, 1, 10))
+        assert created == ["operations_p202501", "operations_p202502", "operations_p202503"]
+        assert await create_partitions(conn, months_ahead=2, today=date(2025, 1, 10)) == []
+        assert await conn.fetchval("SELECT count(*) FROM operations_default") == 0
+        assert await conn.fetchval("SELECT count(*) FROM operations_p202502") == 1
+
+        archived = await detach_partitions(conn, older_than_months=1, today=date(2025, 3, 20), archive_dir=tmp_path)
+        assert archived == ["operations_p202501"]
+        detached = await detach_partitions(conn, older_than_months=1, today=date(2025, 3, 20))
+        assert detached == ["operations_p202502"]
+        assert await list_partitions(conn) == ["operations_default", "operations_p202503"]
+        assert await conn.fetchval("SELECT count(*) FROM operations") == 1
+        assert await conn.fetchval("SELECT to_regclass('operations_p202501')") is None
+        assert await conn.fetchval("SELECT count(*) FROM operations_p202502") == 1
+        await conn.execute("DROP TABLE operations_p202502")
+
+    run_with_connection(scenario)
+    with gzip.open(tmp_path / "operations_p202501.csv.gz", "rt") as archive:
+        lines = archive.read().splitlines()
+    assert lines[0] == "id,wallet_id,operation_type,amount,created_at"
+    assert len(lines) == 2
@@ -0,0 +1,57 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy import update
+
+from app.db.base import DBConnectionManager
+from app.models.checkpoint import WalletCheckpoint
+from app.models.enums import OperationType
+from app.models.wallet import Wallet
+from app.services.reconciliation import Reconciler
+from app.services.wallet_service import WalletService
+
+
+def run_in_process(scenario):
+    async def main():
+        try:
+            await scenario(WalletService(DBConnectionManager()), Reconciler(DBConnectionManager, batch_size=2, concurrency=2))
+        finally:
+            await DBConnectionManager.dispose_engine()
+
+    asyncio.run(main())
+
+
+def test_reconciliation_advances_checkpoints_and_reports_drift(db_session):
+    wallet_ids = sorted(uuid4() for _ in range(5))
+
+    async def scenario(service, reconciler):
+        for wallet_id in wallet_ids:
+            await service.create_wallet_by_id(wallet_id, 1000)
+            await service.apply_operation(wallet_id, 500, OperationType.DEPOSIT)
+            await service.apply_operation(wallet_id, 300, OperationType.WITHDRAW)
+
+        report = await reconciler.run()
+        assert report.checked_wallets == 5
+        assert report.advanced_checkpoints == 5
+        assert report.drifted == []
+
+        checkpoint = db_session.get(WalletCheckpoint, wallet_ids[0])
+        assert checkpoint.balance == 1200
+        assert checkpoint.last_operation_id is not None
+
+        # Nothing new to cover, the second run only compares balances.
+        report = await reconciler.run()
+        assert report.advanced_checkpoints == 0
+        assert report.drifted == []
+
+        db_session.execute(update(Wallet).where(Wallet.id == wallet_ids[3]).values(balance=10000))
+        db_session.commit()
+        await service.apply_operation(wallet_ids[1], 100, OperationType.DEPOSIT)
+
+        report = await reconciler.run()
+        assert report.advanced_checkpoints == 1
+        assert [(d.wallet_id, d.balance, d.expected_balance) for d in report.drifted] == [
+            (wallet_ids[3], 10000, 1200),
+        ]
+
+    run_in_process(scenario)
@@ -0,0 +1,191 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.db.base import DBConnectionManager
+from app.models.enums import OperationType
+from app.models.wallet import Wallet
+from app.models.wallet_stripe import WalletStripe
+from app.services.wallet_service import (
+    InsufficientFundsException,
+    UnrecognizedWalletId,
+    WalletService,
+    get_operation_combiner,
+)
+from app.services.warmup import prepare_hot_statements
+
+
+def run_with_service(scenario):
+    # Settings of the web service can't be changed from tests, so the service runs in this process.
+    async def main():
+        try:
+            await scenario(WalletService(DBConnectionManager()))
+        finally:
+            await DBConnectionManager.dispose_engine()
+
+    asyncio.run(main())
+
+
+def test_asyncpg_backend_matches_orm_contract(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "REPOSITORY_BACKEND", "asyncpg")
+    wallet_id = uuid4()
+    striped_id = uuid4()
+    db_session.add_all([Wallet(id=wallet_id, balance=0), Wallet(id=striped_id, balance=0)])
+    db_session.commit()
+
+    async def scenario(service):
+        operation = await service.apply_operation(wallet_id, 10000, OperationType.DEPOSIT)
+        assert operation.wallet_id == wallet_id
+        with pytest.raises(InsufficientFundsException):
+            await service.apply_operation(wallet_id, 15000, OperationType.WITHDRAW)
+        with pytest.raises(UnrecognizedWalletId):
+            await service.apply_operation(uuid4(), 100, OperationType.DEPOSIT)
+        assert (await service.get_wallet(wallet_id)).balance == 10000
+        with pytest.raises(UnrecognizedWalletId):
+            await service.get_wallet(uuid4())
+
+        await service.enable_striping(striped_id, 2)
+        await service.apply_operation(striped_id, 700, OperationType.DEPOSIT)
+        assert (await service.get_wallet(striped_id)).balance == 700
+
+    run_with_service(scenario)
+
+
+def test_opposite_transfers_do_not_deadlock(db_session):
+    first_id, second_id = uuid4(), uuid4()
+    db_session.add_all([Wallet(id=first_id, balance=100000), Wallet(id=second_id, balance=100000)])
+    db_session.commit()
+
+    async def scenario(service):
+        transfers = [
+            service.transfer(*(first_id, second_id) if i % 2 else (second_id, first_id), 100)
+            for i in range(40)
+        ]
+        await asyncio.gather(*transfers)
+        assert (await service.get_wallet(first_id)).balance == 100000
+        assert (await service.get_wallet(second_id)).balance == 100000
+
+    run_with_service(scenario)
+
+
+def test_group_commit_isolates_failed_operations(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "GROUP_COMMIT_ENABLED", True)
+    wallet_ids = [uuid4() for _ in range(3)]
+    db_session.add_all([Wallet(id=wallet_id, balance=1000) for wallet_id in wallet_ids])
+    db_session.commit()
+
+    async def scenario(service):
+        results = await asyncio.gather(
+            service.apply_operation(wallet_ids[0], 500, OperationType.DEPOSIT),
+            service.apply_operation(wallet_ids[1], 5000, OperationType.WITHDRAW),
+            service.apply_operation(uuid4(), 100, OperationType.DEPOSIT),
+            service.apply_operation(wallet_ids[2], 1000, OperationType.WITHDRAW),
+            return_exceptions=True,
+        )
+        assert results[0].wallet_id == wallet_ids[0]
+        assert isinstance(results[1], InsufficientFundsException)
+        assert isinstance(results[2], UnrecognizedWalletId)
+        assert results[3].wallet_id == wallet_ids[2]
+        assert [(await service.get_wallet(wallet_id)).balance for wallet_id in wallet_ids] == [
+            1500, 1000, 0,
+        ]
+
+    run_with_service(scenario)
+
+
+def test_warm_up_leaves_prepared_connections_in_pool(db_session):
+    async def main():
+        try:
+            await DBConnectionManager.warm_up(2, prepare_hot_statements)
+            assert DBConnectionManager.is_ready()
+            assert DBConnectionManager._engine.pool.checkedin() == 2
+            assert DBConnectionManager._read_engine.pool.checkedin() == 2
+        finally:
+            await DBConnectionManager.dispose_engine()
+        assert not DBConnectionManager.is_ready()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("max_conflicts", [3, 1])
+def test_optimistic_mode_applies_concurrent_operations(db_session, monkeypatch, max_conflicts):
+    monkeypatch.setattr(settings, "APPLY_OPERATION_MODE", "optimistic")
+    monkeypatch.setattr(settings, "OPERATION_COMBINER_ENABLED", False)
+    monkeypatch.setattr(settings, "OPTIMISTIC_MAX_CONFLICTS", max_conflicts)
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.commit()
+
+    async def scenario(service):
+        await asyncio.gather(*[
+            service.apply_operation(wallet_id, 100, OperationType.DEPOSIT) for _ in range(50)
+        ])
+        with pytest.raises(InsufficientFundsException):
+            await service.apply_operation(wallet_id, 5100, OperationType.WITHDRAW)
+        assert (await service.get_wallet(wallet_id)).balance == 5000
+
+    run_with_service(scenario)
+    db_session.expire_all()
+    assert db_session.get(Wallet, wallet_id).version == 51
+
+
+def test_striped_deposits_keep_stripe_locks_in_order(db_session):
+    deposit_only_id, mixed_id = uuid4(), uuid4()
+    db_session.add_all([Wallet(id=deposit_only_id, balance=0), Wallet(id=mixed_id, balance=1000)])
+    db_session.commit()
+
+    async def scenario(service):
+        await service.enable_striping(deposit_only_id, 8)
+        await service.enable_striping(mixed_id, 8)
+        await service.apply_operations_batch([(deposit_only_id, 100, OperationType.DEPOSIT)] * 5, atomic=True)
+        await service.apply_operations_batch([
+            (mixed_id, 100, OperationType.DEPOSIT),
+            (mixed_id, 50, OperationType.WITHDRAW),
+            (mixed_id, 30, OperationType.DEPOSIT),
+        ], atomic=True)
+
+    run_with_service(scenario)
+    stripes = {
+        wallet_id: [stripe.balance for stripe in db_session.query(WalletStripe).filter_by(wallet_id=wallet_id)]
+        for wallet_id in (deposit_only_id, mixed_id)
+    }
+    # Deposits of one transaction go to a single stripe, stripe 0 if it also withdraws.
+    assert sorted(stripes[deposit_only_id]) == [0] * 7 + [500]
+    mixed = db_session.query(WalletStripe).filter_by(wallet_id=mixed_id, stripe_no=0).one()
+    assert mixed.balance == sum(stripes[mixed_id]) == 1080
+
+
+def test_single_statement_mode_bypasses_combiner(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "APPLY_OPERATION_MODE", "single_statement")
+    monkeypatch.setattr(settings, "OPERATION_COMBINER_ENABLED", True)
+    monkeypatch.setattr(get_operation_combiner(), "submit", None)
+    wallet_id = uuid4()
+    db_session.add(Wallet(id=wallet_id, balance=0))
+    db_session.commit()
+
+    async def scenario(service):
+        await asyncio.gather(*[
+            service.apply_operation(wallet_id, 100, OperationType.DEPOSIT) for _ in range(10)
+        ])
+        assert (await service.get_wallet(wallet_id)).balance == 1000
+
+    run_with_service(scenario)
+
+
+def test_wallet_import_reports_first_duplicates_only(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "WALLET_IMPORT_MAX_REPORTED_DUPLICATES", 1)
+    wallet_id = uuid4()
+
+    async def rows():
+        for line in range(1, 5):
+            yield line, wallet_id, 100
+
+    async def scenario(service):
+        result = await service.import_wallets(rows())
+        assert result.imported == 1
+        assert result.duplicate_count == 3
+        assert [(d.line, d.id) for d in result.duplicates] == [(2, wallet_id)]
+
+    run_with_service(scenario)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.db.base import DatabaseBusyException, DBConnectionManager
+from app.main import create_app
+
+
+class LockNotAvailable(Exception):
+    sqlstate = "55P03"
+
+
+class DeadlockDetected(Exception):
+    sqlstate = "40P01"
+
+
+class UniqueViolation(Exception):
+    sqlstate = "23505"
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+
+    @app.get("/pool-exhausted")
+    async def pool_exhausted():
+        raise DatabaseBusyException()
+
+    @app.get("/lock-timeout")
+    async def lock_timeout():
+        raise OperationalError("UPDATE wallets", {}, LockNotAvailable())
+
+    @app.get("/deadlock")
+    async def deadlock():
+        raise OperationalError("UPDATE wallets", {}, DeadlockDetected())
+
+    @app.get("/other-error")
+    async def other_error():
+        raise OperationalError("INSERT INTO wallets", {}, UniqueViolation())
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+@pytest.mark.parametrize("path", ["/pool-exhausted", "/lock-timeout", "/deadlock"])
+def test_exceeded_budgets_fail_fast_with_retry_after(client, path):
+    r = client.get(path)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(settings.RETRY_AFTER_SECONDS)
+
+
+def test_other_database_errors_are_not_retryable(client):
+    r = client.get("/other-error")
+    assert r.status_code == 500
+    assert "Retry-After" not in r.headers
+
+
+def test_sessions_over_in_flight_limit_are_rejected(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(DBConnectionManager, "_admission", asyncio.Semaphore(2))
+        monkeypatch.setattr(settings, "DB_ADMISSION_TIMEOUT_SECONDS", 0.01)
+        first = await DBConnectionManager.get_session()
+        second = await DBConnectionManager.get_read_session()
+        with pytest.raises(DatabaseBusyException):
+            await DBConnectionManager.get_session()
+        await first.close()
+        await first.close()
+        third = await DBConnectionManager.get_session()
+        with pytest.raises(DatabaseBusyException):
+            await DBConnectionManager.get_session()
+        await second.close()
+        await third.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.models.enums import OperationType
+from app.services.combiner import WalletOperationCombiner
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def test_queued_operations_are_applied_together_in_arrival_order():
+    batches = []
+
+    async def apply_batch(wallet_id, batch):
+        batches.append([p.amount for p in batch])
+        await asyncio.sleep(0.01)
+        return [
+            InsufficientFunds() if p.op_type is OperationType.WITHDRAW else p.amount
+            for p in batch
+        ]
+
+    async def scenario():
+        combiner = WalletOperationCombiner(max_batch_size=10)
+        wallet_id = uuid4()
+        first = asyncio.create_task(
+            combiner.submit(wallet_id, 1, OperationType.DEPOSIT, apply_batch)
+        )
+        await asyncio.sleep(0)
+        rest = [
+            asyncio.create_task(combiner.submit(wallet_id, i, op_type, apply_batch))
+            for i, op_type in [(2, OperationType.DEPOSIT), (3, OperationType.WITHDRAW), (4, OperationType.DEPOSIT)]
+        ]
+        return await asyncio.gather(first, *rest, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert batches == [[1], [2, 3, 4]]
+    assert results[0] == 1
+    assert results[1] == 2
+    assert isinstance(results[2], InsufficientFunds)
+    assert results[3] == 4
+
+
+def test_batch_failure_is_raised_to_every_caller():
+    async def apply_batch(wallet_id, batch):
+        raise LookupError()
+
+    async def scenario():
+        combiner = WalletOperationCombiner(max_batch_size=10)
+        wallet_id = uuid4()
+        return await asyncio.gather(
+            combiner.submit(wallet_id, 1, OperationType.DEPOSIT, apply_batch),
+            combiner.submit(wallet_id, 2, OperationType.DEPOSIT, apply_batch),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, LookupError) for r in results)
+
+
+@pytest.mark.parametrize("max_batch_size", [1, 2])
+def test_batches_respect_max_size(max_batch_size):
+    sizes = []
+
+    async def apply_batch(wallet_id, batch):
+        sizes.append(len(batch))
+        return [p.amount for p in batch]
+
+    async def scenario():
+        combiner = WalletOperationCombiner(max_batch_size=max_batch_size)
+        wallet_id = uuid4()
+        return await asyncio.gather(*[
+            combiner.submit(wallet_id, i, OperationType.DEPOSIT, apply_batch) for i in range(1, 5)
+        ])
+
+    assert asyncio.run(scenario()) == [i for i in range(1, 5)]
+    assert all(size <= max_batch_size for size in sizes)
+
+
+def test_cancelled_drainer_releases_waiting_callers():
+    async def apply_batch(wallet_id, batch):
+        await asyncio.Event().wait()
+
+    async def scenario():
+        combiner = WalletOperationCombiner(max_batch_size=10)
+        wallet_id = uuid4()
+        callers = [
+            asyncio.create_task(combiner.submit(wallet_id, i, OperationType.DEPOSIT, apply_batch)) for i in (1, 2)
+        ]
+        await asyncio.sleep(0.01)
+        for drainer in list(combiner._drainers):
+            drainer.cancel()
+        return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
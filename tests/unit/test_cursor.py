@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.schemas.cursor import InvalidCursorException, decode_operation_cursor, encode_operation_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 9, 26, 17, 37, 15, 123456, tzinfo=timezone(timedelta(hours=3)))
+    operation_id = uuid4()
+
+    assert decode_operation_cursor(encode_operation_cursor(created_at, operation_id)) == (created_at, operation_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "MjAyNS0wOS0yNg"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorException):
+        decode_operation_cursor(cursor)
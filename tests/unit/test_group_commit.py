@@ -0,0 +1,87 @@
+import asyncio
+from uuid import uuid4
+
+from app.models.enums import OperationType
+from app.services.group_commit import GroupCommitScheduler
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def test_operations_within_window_share_one_group():
+    groups = []
+
+    async def apply_group(group):
+        groups.append([g.amount for g in group])
+        return [
+            InsufficientFunds() if g.op_type is OperationType.WITHDRAW else g.amount
+            for g in group
+        ]
+
+    async def scenario():
+        scheduler = GroupCommitScheduler(window_seconds=0.01, max_size=10)
+        return await asyncio.gather(
+            *[
+                scheduler.submit(uuid4(), i, op_type, apply_group)
+                for i, op_type in [(1, OperationType.DEPOSIT), (2, OperationType.WITHDRAW), (3, OperationType.DEPOSIT)]
+            ],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+
+    assert groups == [[1, 2, 3]]
+    assert results[0] == 1
+    assert isinstance(results[1], InsufficientFunds)
+    assert results[2] == 3
+
+
+def test_full_group_is_applied_without_waiting_for_window():
+    groups = []
+
+    async def apply_group(group):
+        groups.append(len(group))
+        return [g.amount for g in group]
+
+    async def scenario():
+        scheduler = GroupCommitScheduler(window_seconds=60, max_size=2)
+        return await asyncio.wait_for(
+            asyncio.gather(*[scheduler.submit(uuid4(), i, OperationType.DEPOSIT, apply_group) for i in range(4)]),
+            timeout=1,
+        )
+
+    assert asyncio.run(scenario()) == [i for i in range(4)]
+    assert groups == [2, 2]
+
+
+def test_group_failure_is_raised_to_every_caller():
+    async def apply_group(group):
+        raise LookupError()
+
+    async def scenario():
+        scheduler = GroupCommitScheduler(window_seconds=0, max_size=10)
+        return await asyncio.gather(
+            scheduler.submit(uuid4(), 1, OperationType.DEPOSIT, apply_group),
+            scheduler.submit(uuid4(), 2, OperationType.DEPOSIT, apply_group),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(result, LookupError) for result in asyncio.run(scenario()))
+
+
+def test_cancelled_group_releases_waiting_callers():
+    async def apply_group(group):
+        await asyncio.Event().wait()
+
+    async def scenario():
+        scheduler = GroupCommitScheduler(window_seconds=0, max_size=10)
+        callers = [
+            asyncio.create_task(scheduler.submit(uuid4(), i, OperationType.DEPOSIT, apply_group)) for i in (1, 2)
+        ]
+        await asyncio.sleep(0.01)
+        for group in list(scheduler._groups):
+            group.cancel()
+        return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in asyncio.run(scenario()))
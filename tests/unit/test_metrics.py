@@ -0,0 +1,38 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.metrics import HTTP_REQUEST_DURATION, PrometheusMiddleware, render_metrics
+
+
+def _observed(method: str, route: str, status: str) -> float:
+    for metric in HTTP_REQUEST_DURATION.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.labels == {"method": method, "route": route, "status": status}:
+                return sample.value
+    return 0.0
+
+
+def test_requests_are_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    before_ok = _observed("GET", "/items/{item_id}", "200")
+    before_missing = _observed("GET", "/items/{item_id}", "404")
+    before_unmatched = _observed("GET", "unmatched", "404")
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/items/0")
+    client.get("/nowhere")
+
+    assert _observed("GET", "/items/{item_id}", "200") == before_ok + 2
+    assert _observed("GET", "/items/{item_id}", "404") == before_missing + 1
+    assert _observed("GET", "unmatched", "404") == before_unmatched + 1
+    assert b"http_request_duration_seconds_bucket" in render_metrics()
@@ -0,0 +1,66 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import app.crud.operation_export as crud_export
+from app.api.v1.routes import accepts_gzip
+from app.services.wallet_service import EXPORT_QUEUE_SIZE, WalletService
+
+
+class FakeConnectionManager:
+    @asynccontextmanager
+    async def get_raw_connection(self, read_only=False):
+        yield object()
+
+
+def collect(chunks):
+    async def main():
+        return [chunk async for chunk in chunks]
+
+    return asyncio.run(main())
+
+
+def test_export_passes_all_chunks_in_order(monkeypatch):
+    async def copy_operations(conn, output, ndjson, wallet_id, since, until):
+        # More chunks than the queue holds, so the copy has to wait for the reader.
+        for i in range(EXPORT_QUEUE_SIZE * 3):
+            await output(b"%d\n" % i)
+
+    monkeypatch.setattr(crud_export, "copy_operations", copy_operations)
+    chunks = collect(WalletService(FakeConnectionManager()).export_operations(ndjson=False))
+    assert chunks == [b"%d\n" % i for i in range(EXPORT_QUEUE_SIZE * 3)]
+
+
+def test_export_reraises_copy_error_after_sent_chunks(monkeypatch):
+    async def copy_operations(conn, output, ndjson, wallet_id, since, until):
+        await output(b"id,wallet_id\n")
+        raise ConnectionResetError()
+
+    monkeypatch.setattr(crud_export, "copy_operations", copy_operations)
+    received = []
+
+    async def main():
+        async for chunk in WalletService(FakeConnectionManager()).export_operations(ndjson=False):
+            received.append(chunk)
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(main())
+    assert received == [b"id,wallet_id\n"]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("", False),
+        ("gzip", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, br", False),
+        ("*", True),
+        ("*, gzip;q=0", False),
+        ("identity", False),
+    ],
+)
+def test_gzip_is_negotiated_by_quality(accept_encoding, expected):
+    assert accepts_gzip(accept_encoding) is expected
@@ -1,16 +1,49 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from decimal import Decimal
+from uuid import uuid4
 
 import pytest
 from pydantic import ValidationError
 
-from app.schemas.operation import OperationCreate
+from app.schemas.operation import OperationCreate, OperationRead
+from app.schemas.transfer import TransferCreate
+from app.schemas.wallet import WalletCreate
 from app.models.enums import OperationType
 
 
-@pytest.mark.parametrize("amount", [Decimal("0"), Decimal("-0.01")])
+@pytest.mark.parametrize("amount", [Decimal("0"), Decimal("-0.01"), Decimal("0.001"), Decimal("0.004")])
 def test_amount_rejects_non_positive(amount):
     with pytest.raises(ValidationError):
         OperationCreate(operation_type=OperationType.DEPOSIT, amount=amount)
 
+
+def test_transfer_amount_is_checked_after_rounding():
+    with pytest.raises(ValidationError):
+        TransferCreate(from_wallet_id=uuid4(), to_wallet_id=uuid4(), amount="0.001")
+    assert TransferCreate(from_wallet_id=uuid4(), to_wallet_id=uuid4(), amount="0.005").amount == 1
+
+
+@pytest.mark.parametrize("balance, expected", [("0", 0), ("0.001", 0), ("12.345", 1235)])
+def test_wallet_balance_may_be_zero(balance, expected):
+    assert WalletCreate(id=uuid4(), balance=balance).balance == expected
+
+
+def test_wallet_balance_rejects_negative():
+    with pytest.raises(ValidationError):
+        WalletCreate(id=uuid4(), balance="-5")
+
+
+def test_amounts_are_minor_units_inside_and_decimals_outside():
+    assert OperationCreate(operation_type=OperationType.DEPOSIT, amount="10.505").amount == 1051
+    read = OperationRead.model_validate({
+        "operation_type": OperationType.DEPOSIT,
+        "amount": 1051,
+        "id": uuid4(),
+        "wallet_id": uuid4(),
+        "created_at": datetime.now(timezone.utc),
+    })
+    assert read.model_dump(mode="json")["amount"] == "10.51"
+    # Stored idempotent responses hold the amount as the API showed it.
+    assert OperationRead.model_validate(read.model_dump(mode="json")).amount == 1051
@@ -0,0 +1,16 @@
+from datetime import date
+
+from app.maintenance.partitions import add_months, month_start, partition_month, partition_name
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert add_months(month_start(date(2025, 5, 31)), 0) == date(2025, 5, 1)
+
+
+def test_partition_name_round_trip():
+    assert partition_name(date(2025, 3, 1)) == "operations_p202503"
+    assert partition_month("operations_p202503") == date(2025, 3, 1)
+    assert partition_month("operations_default") is None
+    assert partition_month("wallets") is None
@@ -0,0 +1,12 @@
+from fastapi.testclient import TestClient
+
+from app.db.base import DBConnectionManager
+from app.main import create_app
+
+
+def test_ready_only_after_pool_warm_up(monkeypatch):
+    client = TestClient(create_app())
+    monkeypatch.setattr(DBConnectionManager, "_warm", False)
+    assert client.get("/ready").status_code == 503
+    monkeypatch.setattr(DBConnectionManager, "_warm", True)
+    assert client.get("/ready").json() == {"status": "ready"}
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from typing import List
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+
+from app.models.enums import OperationType
+from app.schemas.operation import OperationRead, OperationRow, operation_rows_adapter
+from app.schemas.wallet import WalletRead, WalletRow, wallet_row_adapter, wallet_rows_adapter
+
+
+def test_rows_have_the_fields_of_read_models():
+    assert list(OperationRow.__annotations__) == list(OperationRead.model_fields)
+    assert list(WalletRow.__annotations__) == list(WalletRead.model_fields)
+
+
+def test_operation_rows_serialize_like_operation_read():
+    rows = [
+        {
+            "operation_type": op_type,
+            "amount": 1050,
+            "id": uuid4(),
+            "wallet_id": uuid4(),
+            "created_at": datetime(2025, 9, 26, 17, 37, 15, 123456, tzinfo=timezone.utc),
+            "transfer_id": uuid4() if op_type in (OperationType.TRANSFER_OUT, OperationType.TRANSFER_IN) else None,
+        }
+        for op_type in OperationType
+    ]
+    expected = TypeAdapter(List[OperationRead]).dump_json([OperationRead(**row) for row in rows])
+    assert operation_rows_adapter.dump_json(rows) == expected
+    assert b'"amount":"10.50"' in expected
+
+
+def test_wallet_rows_serialize_like_wallet_read():
+    now = datetime.now(timezone.utc)
+    row = {"id": uuid4(), "created_at": now, "updated_at": now, "balance": 0}
+    assert wallet_row_adapter.dump_json(row) == WalletRead(**row).model_dump_json().encode()
+    assert wallet_rows_adapter.dump_json([row]) == b"[" + WalletRead(**row).model_dump_json().encode() + b"]"
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.main import create_app
+from app.models.enums import OperationType
+from app.services.combiner import WalletOperationCombiner
+from app.services.group_commit import GroupCommitScheduler
+from app.tracing import RequestTrace, current_trace, install_sql_tracing, trace_phase, traced
+
+
+@traced
+async def apply_operation():
+    with trace_phase("lock_wait"):
+        pass
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+
+    @app.get("/traced")
+    async def traced_route():
+        await apply_operation()
+        return {}
+
+    return TestClient(app)
+
+
+def traces(caplog, prefix="Request trace: "):
+    return [json.loads(r.getMessage()[len(prefix):]) for r in caplog.records if r.getMessage().startswith(prefix)]
+
+
+def test_requests_with_debug_header_are_traced(client, caplog):
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        client.get("/traced")
+        client.get("/traced", headers={settings.TRACE_HEADER: "1"})
+    [trace] = traces(caplog)
+    assert trace["path"] == "/traced" and trace["status"] == "200"
+    assert trace["phases"]["service.apply_operation"]["count"] == 1
+    assert trace["phases"]["lock_wait"]["count"] == 1
+    assert trace["outside_service_ms"] <= trace["wall_ms"]
+    assert "profile" not in trace
+
+
+def test_sampled_requests_are_traced_and_profiled(client, caplog, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "TRACE_PROFILE_DIR", str(tmp_path))
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        client.get("/traced")
+    [trace] = traces(caplog)
+    assert trace["profile"] in {str(p) for p in tmp_path.glob("*_GET_traced.prof")}
+
+
+def test_statements_are_recorded_only_while_tracing():
+    engine = create_engine("sqlite://")
+    install_sql_tracing(engine)
+    trace = RequestTrace(method="GET", path="/")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE wallets (id INTEGER)"))
+        token = current_trace.set(trace)
+        try:
+            conn.execute(text("INSERT INTO wallets VALUES (1), (2)"))
+            conn.execute(text("SELECT id FROM wallets"))
+        finally:
+            current_trace.reset(token)
+        conn.execute(text("DELETE FROM wallets"))
+    assert [(s.statement.split()[0], s.rows) for s in trace.statements] == [("INSERT", 2), ("SELECT", None)]
+    summary = trace.summary(wall=0.01, status="200")
+    assert summary["sql_count"] == 2 and summary["sql_rows"] == 2
+
+
+@pytest.mark.parametrize("batched", ["combiner", "group_commit"])
+def test_batches_are_traced_apart_from_their_callers(batched, caplog):
+    combiner = WalletOperationCombiner(max_batch_size=10)
+    scheduler = GroupCommitScheduler(window_seconds=0.01, max_size=10)
+    seen = []
+
+    async def apply(*args):
+        batch = args[-1]
+        seen.append(current_trace.get())
+        with trace_phase("transaction"):
+            await asyncio.sleep(0.01)
+        return [None] * len(batch)
+
+    async def submit(trace):
+        token = current_trace.set(trace)
+        try:
+            if batched == "combiner":
+                await combiner.submit(wallet_id, 1, OperationType.DEPOSIT, apply)
+            else:
+                await scheduler.submit(wallet_id, 1, OperationType.DEPOSIT, apply)
+        finally:
+            current_trace.reset(token)
+
+    wallet_id = uuid4()
+    callers = [RequestTrace(method="POST", path="/operation") for _ in range(2)]
+
+    async def scenario():
+        await asyncio.gather(*(submit(trace) for trace in [*callers, None]))
+
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        asyncio.run(scenario())
+    assert all(trace is not None and trace not in callers for trace in seen)
+    for caller in callers:
+        assert set(caller.phases) == {"batch_wait"}
+    batch_traces = traces(caplog, prefix="Batch trace: ")
+    assert {t["path"] for t in batch_traces} == {batched}
+    assert sorted(sum((t["callers"] for t in batch_traces), [])) == sorted(c.trace_id for c in callers)
+    assert all(t["phases"]["transaction"]["count"] == 1 and t["status"] == "ok" for t in batch_traces)
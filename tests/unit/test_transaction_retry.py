@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.db.retry import RetryBudget, RetryPolicy
+
+
+class DeadlockDetected(Exception):
+    sqlstate = "40P01"
+
+
+class SerializationFailure(Exception):
+    sqlstate = "40001"
+
+
+class UniqueViolation(Exception):
+    sqlstate = "23505"
+
+
+def policy(max_attempts=3, budget=None, delays=None):
+    async def sleep(delay):
+        if delays is not None:
+            delays.append(delay)
+
+    return RetryPolicy(
+        max_attempts=max_attempts,
+        base_delay=0.01,
+        max_delay=0.05,
+        budget=budget or RetryBudget(ratio=0.1, max_tokens=10),
+        sleep=sleep,
+    )
+
+
+def failing(*errors, result="done"):
+    attempts = []
+
+    async def attempt():
+        attempts.append(None)
+        if len(attempts) <= len(errors):
+            raise OperationalError("UPDATE wallets", {}, errors[len(attempts) - 1])
+        return result
+
+    return attempt, attempts
+
+
+def test_retryable_failures_rerun_the_whole_unit_of_work():
+    attempt, attempts = failing(DeadlockDetected(), SerializationFailure())
+    delays = []
+    assert asyncio.run(policy(delays=delays).run(attempt)) == "done"
+    assert len(attempts) == 3
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 0.01 and 0 <= delays[1] <= 0.02
+
+
+def test_other_errors_are_not_retried():
+    attempt, attempts = failing(UniqueViolation())
+    with pytest.raises(OperationalError):
+        asyncio.run(policy().run(attempt))
+    assert len(attempts) == 1
+
+
+def test_gives_up_after_max_attempts():
+    attempt, attempts = failing(*[DeadlockDetected()] * 5)
+    with pytest.raises(OperationalError):
+        asyncio.run(policy(max_attempts=3).run(attempt))
+    assert len(attempts) == 3
+
+
+def test_backoff_is_capped():
+    retry_policy = policy()
+    assert all(retry_policy.delay(attempt) <= 0.05 for attempt in range(1, 20))
+
+
+def test_retries_stop_when_budget_is_spent():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    attempt, attempts = failing(*[DeadlockDetected()] * 5)
+    with pytest.raises(OperationalError):
+        asyncio.run(policy(max_attempts=5, budget=budget).run(attempt))
+    assert len(attempts) == 2
+
+    # Each new unit of work earns back part of a retry.
+    attempt, attempts = failing(DeadlockDetected())
+    with pytest.raises(OperationalError):
+        asyncio.run(policy(budget=budget).run(attempt))
+    attempt, attempts = failing(DeadlockDetected())
+    assert asyncio.run(policy(budget=budget).run(attempt)) == "done"
+    assert len(attempts) == 2
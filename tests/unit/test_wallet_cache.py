@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.schemas.wallet import WalletRead
+from app.services.cache import WalletCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_wallet(balance=1000):
+    now = datetime.now(timezone.utc)
+    return WalletRead(id=uuid4(), balance=balance, created_at=now, updated_at=now)
+
+
+def make_cache(max_size=2, ttl_seconds=5.0):
+    clock = FakeClock()
+    cache = WalletCache(max_size=max_size, ttl_seconds=ttl_seconds, clock=clock)
+    cache.enabled = True
+    return cache, clock
+
+
+def test_hit_miss_and_ttl_expiry():
+    cache, clock = make_cache()
+    wallet = make_wallet()
+
+    assert cache.get(wallet.id) is None
+    cache.put(wallet, cache.version)
+    assert cache.get(wallet.id) == wallet
+    clock.now = 5.0
+    assert cache.get(wallet.id) is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 2, "evictions": 0, "invalidations": 0}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, _ = make_cache(max_size=2)
+    first, second, third = make_wallet(), make_wallet(), make_wallet()
+    for wallet in (first, second):
+        cache.put(wallet, cache.version)
+    cache.get(first.id)
+    cache.put(third, cache.version)
+
+    assert cache.get(second.id) is None
+    assert cache.get(first.id) == first
+    assert cache.evictions == 1
+
+
+def test_fill_racing_with_invalidation_is_dropped():
+    cache, _ = make_cache()
+    wallet = make_wallet()
+    version = cache.version
+    cache.invalidate(wallet.id)
+    cache.put(wallet, version)
+
+    assert cache.get(wallet.id) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache, _ = make_cache()
+    cache.enabled = False
+    wallet = make_wallet()
+    cache.put(wallet, cache.version)
+    cache.enabled = True
+
+    assert cache.get(wallet.id) is None
@@ -0,0 +1,56 @@
+import asyncio
+from uuid import UUID
+
+import pytest
+
+from app.services.wallet_import import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    WalletImportFormatException,
+    parse_wallet_rows,
+)
+
+
+FIRST_ID = "9f13d9c0-7db0-4a46-bdf0-148f9a2a5d22"
+SECOND_ID = "0b5d2d6e-4c1f-4f55-9b55-3c1b3f6b8a10"
+
+
+def parse(chunks, media_type):
+    async def chunk_iter():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [row async for row in parse_wallet_rows(chunk_iter(), media_type)]
+
+    return asyncio.run(collect())
+
+
+def test_csv_lines_split_across_chunks():
+    data = f"id,balance\r\n{FIRST_ID},100.5\r\n\n{SECOND_ID},0".encode()
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    assert parse(chunks, CSV_MEDIA_TYPE) == [
+        (2, UUID(FIRST_ID), 10050),
+        (4, UUID(SECOND_ID), 0),
+    ]
+
+
+def test_ndjson_keeps_decimal_precision():
+    data = f'{{"id": "{FIRST_ID}", "balance": 0.1}}\n{{"id": "{SECOND_ID}", "balance": "7"}}\n'.encode()
+    assert parse([data], NDJSON_MEDIA_TYPE) == [
+        (1, UUID(FIRST_ID), 10),
+        (2, UUID(SECOND_ID), 700),
+    ]
+
+
+@pytest.mark.parametrize("line", [
+    f"{FIRST_ID}",
+    f"not-a-uuid,1",
+    f"{FIRST_ID},abc",
+    f"{FIRST_ID},-1",
+    f"{FIRST_ID},1e20",
+])
+def test_invalid_csv_line_is_reported_with_its_number(line):
+    with pytest.raises(WalletImportFormatException) as e:
+        parse([f"{SECOND_ID},1\n{line}\n".encode()], CSV_MEDIA_TYPE)
+    assert e.value.line == 2